@@ -0,0 +1,126 @@
+"""
+Сравнение оптимизации изображений: прежний перебор качества с шагом 5
+и записью на диск против двоичного поиска качества в памяти (optimize_image)
+
+Использование:
+    python benchmark_optimize_image.py [--max-size-kb 1024] [изображения ...]
+
+Если изображения не указаны, создаются тестовые изображения разного размера.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from utils.image_splitter import optimize_image
+
+def legacy_optimize_image(image_path, output_dir, max_size_kb=1024):
+    """Прежняя реализация optimize_image: уменьшение качества на 5 с записью на диск на каждом шаге"""
+    img = Image.open(image_path)
+    img_format = img.format
+    optimized_path = Path(output_dir) / f"legacy_{os.path.basename(image_path)}"
+
+    quality = 95
+    while quality > 30:
+        img.save(optimized_path, format=img_format, quality=quality)
+        if os.path.getsize(optimized_path) / 1024 <= max_size_kb:
+            return str(optimized_path)
+        quality -= 5
+
+    width, height = img.size
+    ratio = 0.9
+    while ratio > 0.5:
+        resized_img = img.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS)
+        resized_img.save(optimized_path, format=img_format, quality=80)
+        if os.path.getsize(optimized_path) / 1024 <= max_size_kb:
+            return str(optimized_path)
+        ratio -= 0.1
+
+    return image_path
+
+def create_sample_images(directory):
+    """Создает тестовые JPEG-изображения: однотонные, с градиентом и с шумом разных размеров"""
+    random.seed(0)
+    paths = []
+    for name, size, noise in [
+        ("small_gradient", (1080, 1080), 0),
+        ("photo_like", (2048, 1536), 40),
+        ("large_noise", (3024, 4032), 120),
+        ("huge_noise", (4000, 6000), 255),
+    ]:
+        img = Image.linear_gradient('L').resize(size).convert('RGB')
+        if noise:
+            noise_img = Image.effect_noise(size, noise).convert('RGB')
+            img = Image.blend(img, noise_img, 0.5)
+        path = os.path.join(directory, f"{name}.jpg")
+        img.save(path, format='JPEG', quality=98)
+        paths.append(path)
+    return paths
+
+class EncodeCounter:
+    """Подсчитывает вызовы Image.save (количество кодирований изображения)"""
+
+    def __init__(self):
+        self.count = 0
+        self._original_save = Image.Image.save
+
+    def __enter__(self):
+        counter = self
+
+        def counting_save(img, *args, **kwargs):
+            counter.count += 1
+            return counter._original_save(img, *args, **kwargs)
+
+        Image.Image.save = counting_save
+        return self
+
+    def __exit__(self, *exc):
+        Image.Image.save = self._original_save
+
+def measure(func):
+    """Выполняет func и возвращает (результат, количество кодирований, время в секундах)"""
+    with EncodeCounter() as counter:
+        started_at = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started_at
+    return result, counter.count, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение оптимизации изображений")
+    parser.add_argument("images", nargs="*", help="Изображения для проверки")
+    parser.add_argument("--max-size-kb", type=int, default=1024, help="Максимальный размер изображения (KB)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    images = args.images or create_sample_images(work_dir)
+
+    print(f"{'Изображение':<24}{'Было, KB':>10}{'Кодир. было/стало':>20}{'Время было/стало, мс':>24}{'Размер было/стало, KB':>24}")
+
+    totals = [0, 0, 0.0, 0.0]
+    for image_path in images:
+        legacy_path, legacy_encodes, legacy_time = measure(
+            lambda: legacy_optimize_image(image_path, work_dir, args.max_size_kb)
+        )
+        new_path, new_encodes, new_time = measure(lambda: optimize_image(image_path, args.max_size_kb))
+
+        totals[0] += legacy_encodes
+        totals[1] += new_encodes
+        totals[2] += legacy_time
+        totals[3] += new_time
+
+        print(
+            f"{os.path.basename(image_path):<24}"
+            f"{os.path.getsize(image_path) / 1024:>10.0f}"
+            f"{f'{legacy_encodes}/{new_encodes}':>20}"
+            f"{f'{legacy_time * 1000:.0f}/{new_time * 1000:.0f}':>24}"
+            f"{f'{os.path.getsize(legacy_path) / 1024:.0f}/{os.path.getsize(new_path) / 1024:.0f}':>24}"
+        )
+
+    print(f"\nВсего кодирований: {totals[0]} -> {totals[1]}, время: {totals[2]:.2f} -> {totals[3]:.2f} сек")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Измерение времени импорта модулей при запуске бота (main.py)
+
+Запускает интерпретатор с флагом -X importtime и выводит самые тяжелые
+импорты по суммарному времени, а также время по пакетам верхнего уровня.
+
+Использование:
+    python benchmark_startup.py [--module main] [--top 25]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Тяжелые библиотеки, которые не должны загружаться при запуске бота
+HEAVY_PACKAGES = ['moviepy', 'numpy', 'imageio', 'instagrapi']
+
+def run_importtime(module):
+    """
+    Импортирует модуль в отдельном процессе с -X importtime
+
+    Returns:
+        tuple: (код возврата, список записей (self_us, cumulative_us, name), stderr)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            entries.append((int(self_us), int(cumulative_us), name.strip()))
+        except ValueError:
+            continue
+
+    return result.returncode, entries, result.stderr
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта модулей при запуске бота")
+    parser.add_argument("--module", default="main", help="Импортируемый модуль")
+    parser.add_argument("--top", type=int, default=25, help="Количество выводимых модулей")
+    args = parser.parse_args()
+
+    returncode, entries, stderr = run_importtime(args.module)
+    if returncode != 0:
+        print(f"Ошибка при импорте {args.module}:")
+        print('\n'.join(line for line in stderr.splitlines() if not line.startswith('import time:'))[-2000:])
+        return
+
+    total_us = sum(self_us for self_us, _, _ in entries)
+    print(f"Общее время импорта {args.module}: {total_us / 1000:.1f} мс ({len(entries)} модулей)\n")
+
+    print("Самые тяжелые импорты (суммарное время):")
+    for _, cumulative_us, name in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} мс  {name}")
+
+    packages = defaultdict(int)
+    for self_us, _, name in entries:
+        packages[name.split('.')[0]] += self_us
+
+    print("\nВремя по пакетам верхнего уровня:")
+    for package, package_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {package_us / 1000:9.1f} мс  {package}")
+
+    print("\nТяжелые библиотеки при запуске:")
+    for package in HEAVY_PACKAGES:
+        if package in packages:
+            print(f"  {package}: загружается ({packages[package] / 1000:.1f} мс)")
+        else:
+            print(f"  {package}: не загружается")
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import socket
 from pathlib import Path
 
 # Загружаем переменные окружения из файла .env
@@ -27,9 +28,31 @@ ADMIN_USER_IDS = [6499246016]  # Замените на ваш Telegram ID
 
 # Настройки базы данных
 DATABASE_URL = f'sqlite:///{DATA_DIR}/database.sqlite'
+DB_POOL_SIZE = 10  # Количество постоянных соединений в пуле
+DB_MAX_OVERFLOW = 20  # Дополнительные соединения сверх DB_POOL_SIZE при пиковой нагрузке
+DB_POOL_TIMEOUT = 30  # Время ожидания свободного соединения (в секундах)
+
+# Настройки SQLite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")  # WAL позволяет читать во время записи
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL безопасен в режиме WAL и быстрее FULL
+SQLITE_BUSY_TIMEOUT = 30  # Время ожидания снятия блокировки базы (в секундах)
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # Размер отображаемой в память части базы (в байтах)
 
 # Настройки многопоточности
 MAX_WORKERS = 5  # Максимальное количество одновременных потоков
+TASK_QUEUE_MAX_SIZE = 1000  # Максимальное количество задач в очереди ожидания на выполнение
+EXECUTOR_STATS_LOG_INTERVAL = 5 * 60  # Интервал записи метрик очереди выполнения задач в лог (в секундах)
+
+# Настройки захвата задач
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")  # Идентификатор владельца захваченных задач
+TASK_LEASE_SECONDS = 5 * 60  # Время аренды задачи, после которого она может быть захвачена повторно (в секундах)
+TASK_HEARTBEAT_INTERVAL = 60  # Интервал продления аренды выполняемых задач (в секундах)
+
+# Настройки отдельных процессов-обработчиков (worker.py)
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))  # Количество процессов на машине
+WORKER_POLL_INTERVAL = 2  # Пауза между проверками очереди, если задач нет (в секундах)
+WORKER_RECLAIM_INTERVAL = 60  # Интервал возврата задач с истекшей арендой (в секундах)
+RUN_EMBEDDED_SCHEDULER = os.getenv("RUN_EMBEDDED_SCHEDULER", "1") == "1"  # Запускать планировщик внутри процесса бота
 
 # Настройки логирования
 LOG_LEVEL = 'INFO'
@@ -38,8 +61,89 @@ LOG_FILE = LOGS_DIR / 'bot.log'
 
 # Настройки Instagram
 INSTAGRAM_LOGIN_ATTEMPTS = 3  # Количество попыток входа
-INSTAGRAM_DELAY_BETWEEN_REQUESTS = 5  # Задержка между запросами (в секундах)
+INSTAGRAM_DELAY_BETWEEN_REQUESTS = 5  # Средний интервал между запросами одного аккаунта (в секундах)
+INSTAGRAM_ACCOUNT_BURST = 10  # Сколько запросов аккаунт может выполнить подряд без ожидания
+INSTAGRAM_PROXY_REQUEST_INTERVAL = 2  # Средний интервал между запросами через один прокси (в секундах)
+INSTAGRAM_PROXY_BURST = 5  # Сколько запросов через один прокси можно выполнить подряд без ожидания
+INSTAGRAM_PUBLISH_INTERVAL = 5  # Средний интервал между публикациями с одного аккаунта (в секундах)
+INSTAGRAM_PUBLISH_BURST = 1  # Сколько публикаций с одного аккаунта можно выполнить подряд без ожидания
+INSTAGRAM_CONFIGURE_ATTEMPTS = 5  # Количество попыток опубликовать загруженное фото (Instagram обрабатывает его не сразу)
+MOSAIC_RETRY_ATTEMPTS = 3  # Сколько раз повторять частично опубликованную мозаику после ошибки
+MOSAIC_RETRY_DELAY = 60  # Пауза перед первым повтором мозаики, удваивается с каждой попыткой (в секундах)
+INSTAGRAM_SESSION_CHECK_TTL = 10 * 60  # Сколько сессия считается активной после последнего успешного запроса (в секундах)
+SESSION_STATS_LOG_INTERVAL = 15 * 60  # Интервал записи статистики проверок сессий в лог (в секундах)
+SESSION_FILE_MIRROR = os.getenv("SESSION_FILE_MIRROR", "1") == "1"  # Дублировать сессии из базы в data/accounts/<id>/session.json
+
+# Настройки проверки валидности аккаунтов
+ACCOUNT_CHECK_CONCURRENCY = 10  # Количество аккаунтов, проверяемых одновременно
+
+# Настройки пула клиентов Instagram
+CLIENT_POOL_MAX_SIZE = 100  # Максимальное количество авторизованных клиентов в памяти
+CLIENT_POOL_IDLE_TIMEOUT = 30 * 60  # Время простоя клиента до вытеснения из пула (в секундах)
+
+# Настройки импорта аккаунтов из файлов
+ACCOUNTS_IMPORT_CHUNK_SIZE = 1000  # Количество аккаунтов, добавляемых в базу одной пачкой
+IMPORT_PROGRESS_INTERVAL = 3  # Минимальный интервал между сообщениями о прогрессе импорта (в секундах)
+
+# Настройки подготовки изображений
+IMAGE_PREP_DIR = MEDIA_DIR / 'prepared'  # Подготовленные к публикации изображения
+IMAGE_PREP_WORKERS = os.cpu_count() or 1  # Количество процессов подготовки изображений
+
+# Настройки хранилища медиа
+MEDIA_STORE_DIR = MEDIA_DIR / 'store'  # Хранилище загруженных из Telegram файлов (имя файла - хеш содержимого)
+MEDIA_DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Размер блока при скачивании файлов из Telegram (в байтах)
+MEDIA_DOWNLOAD_TIMEOUT = 60  # Таймаут скачивания файла из Telegram (в секундах)
+MEDIA_STORE_MAX_SIZE_MB = 20 * 1024  # Максимальный размер хранилища медиа (в мегабайтах)
+MEDIA_GC_INTERVAL = 60 * 60  # Интервал очистки неиспользуемых медиафайлов (в секундах)
+MEDIA_GC_GRACE_PERIOD = 24 * 60 * 60  # Сколько хранить файл, на который не ссылается ни одна задача (в секундах)
+# Директории промежуточных файлов, которые очищаются вместе с хранилищем медиа
+MEDIA_SCRATCH_DIRS = [
+    MEDIA_DIR / 'optimized',
+    MEDIA_DIR / 'mosaic_parts',
+    MEDIA_DIR / 'photos',
+    MEDIA_DIR / 'videos',
+    MEDIA_DIR / 'avatars',
+    IMAGE_PREP_DIR,
+    BASE_DIR / 'telegram_bot' / 'handlers' / 'temp'
+]
+
+# Настройки обработки видео
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")  # Утилита для чтения метаданных видео без декодирования
+FFPROBE_TIMEOUT = 30  # Таймаут чтения метаданных видео (в секундах)
+VIDEO_CACHE_DIR = MEDIA_DIR / 'video_cache'  # Кеш обработанных видео
+VIDEO_CACHE_MAX_SIZE_MB = 5 * 1024  # Максимальный размер кеша обработанных видео (в мегабайтах)
+
+# Профили кодирования видео для Reels (preset и crf - параметры libx264)
+VIDEO_ENCODING_PROFILES = {
+    'fast': {
+        'preset': 'veryfast',
+        'threads': os.cpu_count() or 1,
+        'crf': 26,
+        'bitrate': None,
+        'audio_bitrate': '128k',
+        'audio_fps': 44100
+    },
+    'balanced': {
+        'preset': 'medium',
+        'threads': os.cpu_count() or 1,
+        'crf': 23,
+        'bitrate': None,
+        'audio_bitrate': '128k',
+        'audio_fps': 44100
+    },
+    'quality': {
+        'preset': 'slow',
+        'threads': os.cpu_count() or 1,
+        'crf': 20,
+        'bitrate': None,
+        'audio_bitrate': '192k',
+        'audio_fps': 48000
+    }
+}
+VIDEO_ENCODING_PROFILE = os.getenv("VIDEO_ENCODING_PROFILE", "balanced")  # Профиль кодирования по умолчанию
 
 # Настройки таймаутов для Telegram API
 TELEGRAM_READ_TIMEOUT = 60  # Таймаут чтения в секундах
-TELEGRAM_CONNECT_TIMEOUT = 60  # Таймаут соединения в секундах
\ No newline at end of file
+TELEGRAM_CONNECT_TIMEOUT = 60  # Таймаут соединения в секундах
+TELEGRAM_JOB_WORKERS = 4  # Количество одновременно выполняемых долгих операций бота (публикация, проверки)
+TELEGRAM_PROGRESS_INTERVAL = 3  # Минимальный интервал между обновлениями сообщений о ходе операций в одном чате (в секундах)
\ No newline at end of file
@@ -1,24 +1,98 @@
 import os
 import logging
-from datetime import datetime
-from sqlalchemy import create_engine
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 
-from config import DATABASE_URL
-from database.models import Base, InstagramAccount, Proxy, PublishTask, TaskStatus
+from config import (
+    DATABASE_URL, TASK_LEASE_SECONDS, MAX_WORKERS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT, SQLITE_MMAP_SIZE
+)
+from database.models import Base, InstagramAccount, Proxy, PublishTask, TaskStatus, MediaFile
 
 logger = logging.getLogger(__name__)
 
 # Создаем директорию для базы данных, если она не существует
 os.makedirs(os.path.dirname(DATABASE_URL.replace("sqlite:///", "")), exist_ok=True)
 
+def create_db_engine(database_url=DATABASE_URL):
+    """
+    Создает движок SQLAlchemy с пулом соединений.
+
+    Для файловой базы SQLite включаются WAL, synchronous=NORMAL, busy timeout
+    и mmap, чтобы потоки бота, планировщика и публикаций могли писать
+    одновременно без ошибок "database is locked".
+
+    Args:
+        database_url (str): URL базы данных
+
+    Returns:
+        Engine: Движок SQLAlchemy
+    """
+    pool_settings = {
+        'poolclass': QueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT
+    }
+
+    if not database_url.startswith('sqlite'):
+        return create_engine(database_url, pool_pre_ping=True, **pool_settings)
+
+    # База в памяти существует только в рамках одного соединения, пул ей не нужен
+    if database_url in ('sqlite://', 'sqlite:///:memory:'):
+        return create_engine(database_url)
+
+    db_engine = create_engine(
+        database_url,
+        connect_args={'timeout': SQLITE_BUSY_TIMEOUT, 'check_same_thread': False},
+        **pool_settings
+    )
+
+    @event.listens_for(db_engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+    return db_engine
+
 # Создаем движок SQLAlchemy
-engine = create_engine(DATABASE_URL)
+engine = create_db_engine(DATABASE_URL)
 
 # Создаем фабрику сессий
 Session = sessionmaker(bind=engine)
 
+# Размер пачки для запросов с IN (SQLite ограничивает число параметров запроса)
+BULK_QUERY_CHUNK_SIZE = 500
+# Количество попыток пакетной вставки, если аккаунты с теми же именами добавлены параллельно
+BULK_INSERT_ATTEMPTS = 3
+
+# Обработчики, вызываемые после создания задачи на публикацию (например, планировщик)
+_task_created_listeners = []
+
+def add_task_created_listener(listener):
+    """
+    Регистрирует обработчик создания задачи на публикацию.
+
+    Args:
+        listener (callable): Функция вида listener(task_id, scheduled_time)
+    """
+    _task_created_listeners.append(listener)
+
+def _notify_task_created(task_id, scheduled_time):
+    for listener in _task_created_listeners:
+        try:
+            listener(task_id, scheduled_time)
+        except Exception as e:
+            logger.error(f"Ошибка в обработчике создания задачи {task_id}: {e}")
+
 def init_db():
     """Инициализирует базу данных"""
     Base.metadata.create_all(engine)
@@ -269,6 +343,8 @@ def create_publish_task(account_id, task_type, media_path, caption="", scheduled
         task_id = task.id
         session.close()
 
+        _notify_task_created(task_id, scheduled_time)
+
         return True, task_id
     except Exception as e:
         logger.error(f"Ошибка при создании задачи: {e}")
@@ -277,6 +353,10 @@ def create_publish_task(account_id, task_type, media_path, caption="", scheduled
 def update_publish_task_status(task_id, status, error_message=None, media_id=None):
     """Обновляет статус задачи на публикацию"""
     try:
+        # Менеджеры передают статус строкой ('processing', 'completed', ...)
+        if isinstance(status, str):
+            status = TaskStatus(status)
+
         session = get_session()
         task = session.query(PublishTask).filter_by(id=task_id).first()
 
@@ -290,6 +370,14 @@ def update_publish_task_status(task_id, status, error_message=None, media_id=Non
 
         if status == TaskStatus.COMPLETED:
             task.completed_at = datetime.now()
+            # Повторный запуск выполненной задачи начинается с начала
+            task.progress = 0
+            task.attempts = 0
+
+        # Завершенная задача больше не удерживается обработчиком
+        if status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            task.lease_owner = None
+            task.lease_expires_at = None
 
         session.commit()
         session.close()
@@ -306,6 +394,65 @@ def update_task_status(task_id, status, error_message=None, media_id=None):
     """
     return update_publish_task_status(task_id, status, error_message, media_id)
 
+def retry_publish_task(task_id, scheduled_time, error_message=None):
+    """
+    Возвращает задачу в очередь для повтора после ошибки (прогресс задачи сохраняется)
+
+    Args:
+        task_id (int): ID задачи
+        scheduled_time (datetime): Время повтора
+        error_message (str): Ошибка последней попытки
+
+    Returns:
+        bool: Успешно ли задача возвращена в очередь
+    """
+    try:
+        session = get_session()
+        task = session.query(PublishTask).filter_by(id=task_id).first()
+
+        if not task:
+            session.close()
+            return False
+
+        task.status = TaskStatus.PENDING
+        task.scheduled_time = scheduled_time
+        task.error_message = error_message
+        task.attempts = (task.attempts or 0) + 1
+        task.lease_owner = None
+        task.lease_expires_at = None
+
+        session.commit()
+        session.close()
+
+        _notify_task_created(task_id, scheduled_time)
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при возврате задачи {task_id} в очередь: {e}")
+        return False
+
+def update_task_progress(task_id, progress):
+    """
+    Сохраняет количество выполненных шагов задачи (например, опубликованных частей мозаики)
+
+    Args:
+        task_id (int): ID задачи
+        progress (int): Количество выполненных шагов
+
+    Returns:
+        bool: Успешно ли сохранен прогресс
+    """
+    try:
+        session = get_session()
+        updated = session.query(PublishTask).filter_by(id=task_id).update(
+            {PublishTask.progress: progress}, synchronize_session=False
+        )
+        session.commit()
+        session.close()
+        return bool(updated)
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении прогресса задачи {task_id}: {e}")
+        return False
+
 def get_publish_task(task_id):
     """Получает задачу на публикацию по ID"""
     try:
@@ -363,6 +510,162 @@ def get_scheduled_tasks():
         logger.error(f"Ошибка при получении списка запланированных задач: {e}")
         return []
 
+def claim_due_tasks(owner, limit=MAX_WORKERS, lease_seconds=TASK_LEASE_SECONDS, task_ids=None):
+    """
+    Атомарно захватывает запланированные задачи, время которых наступило.
+
+    Задачи переводятся из PENDING в PROCESSING одним UPDATE, поэтому одну и ту же
+    задачу не могут захватить два обработчика одновременно.
+
+    Задачи одного аккаунта выполняются строго по очереди во всех процессах:
+    не захватываются задачи аккаунтов, у которых уже есть задача с
+    действующей арендой, и за один вызов захватывается не больше одной
+    задачи на аккаунт.
+
+    Args:
+        owner (str): Идентификатор обработчика, захватывающего задачи
+        limit (int): Максимальное количество захватываемых задач
+        lease_seconds (int): Время аренды задачи (в секундах)
+        task_ids (list): Ограничить захват указанными задачами (опционально)
+
+    Returns:
+        list: Задачи, захваченные этим вызовом
+    """
+    try:
+        session = get_session()
+        now = datetime.now()
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+
+        # Аккаунты, задачи которых сейчас выполняет какой-либо обработчик
+        busy_accounts = select(PublishTask.account_id).where(
+            PublishTask.status == TaskStatus.PROCESSING,
+            PublishTask.lease_expires_at > now
+        )
+
+        # Для каждого свободного аккаунта - только его ближайшая готовая задача
+        ranked = select(
+            PublishTask.id,
+            PublishTask.scheduled_time,
+            func.row_number().over(
+                partition_by=PublishTask.account_id,
+                order_by=(PublishTask.scheduled_time, PublishTask.id)
+            ).label('account_rank')
+        ).where(
+            PublishTask.status == TaskStatus.PENDING,
+            PublishTask.scheduled_time != None,
+            PublishTask.scheduled_time <= now,
+            PublishTask.account_id.notin_(busy_accounts)
+        )
+        if task_ids is not None:
+            ranked = ranked.where(PublishTask.id.in_(task_ids))
+        ranked = ranked.subquery()
+
+        due_ids = select(ranked.c.id).where(
+            ranked.c.account_rank == 1
+        ).order_by(ranked.c.scheduled_time).limit(limit)
+
+        claimed = session.query(PublishTask).filter(
+            PublishTask.id.in_(due_ids),
+            PublishTask.status == TaskStatus.PENDING
+        ).update({
+            PublishTask.status: TaskStatus.PROCESSING,
+            PublishTask.lease_owner: owner,
+            PublishTask.lease_expires_at: lease_expires_at
+        }, synchronize_session=False)
+        session.commit()
+
+        if not claimed:
+            session.close()
+            return []
+
+        # Возвращаем только строки, помеченные именно этим вызовом
+        tasks = session.query(PublishTask).filter(
+            PublishTask.status == TaskStatus.PROCESSING,
+            PublishTask.lease_owner == owner,
+            PublishTask.lease_expires_at == lease_expires_at
+        ).order_by(PublishTask.scheduled_time).all()
+        session.close()
+
+        logger.info(f"Обработчик {owner} захватил задач: {len(tasks)}")
+        return tasks
+    except Exception as e:
+        logger.error(f"Ошибка при захвате задач: {e}")
+        return []
+
+def extend_task_leases(owner, task_ids, lease_seconds=TASK_LEASE_SECONDS):
+    """
+    Продлевает аренду задач, которые обработчик еще выполняет (heartbeat).
+
+    Args:
+        owner (str): Идентификатор обработчика
+        task_ids (list): ID выполняемых задач
+        lease_seconds (int): Новое время аренды от текущего момента (в секундах)
+
+    Returns:
+        int: Количество задач, аренда которых продлена
+    """
+    if not task_ids:
+        return 0
+
+    try:
+        session = get_session()
+        extended = session.query(PublishTask).filter(
+            PublishTask.id.in_(task_ids),
+            PublishTask.status == TaskStatus.PROCESSING,
+            PublishTask.lease_owner == owner
+        ).update({
+            PublishTask.lease_expires_at: datetime.now() + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+        session.commit()
+        session.close()
+
+        if extended < len(task_ids):
+            logger.warning(f"Обработчик {owner} потерял аренду {len(task_ids) - extended} задач")
+        return extended
+    except Exception as e:
+        logger.error(f"Ошибка при продлении аренды задач: {e}")
+        return 0
+
+def reclaim_expired_leases():
+    """
+    Возвращает в PENDING задачи, аренда которых истекла (обработчик упал или завис).
+
+    Возвращенные задачи передаются обработчикам создания задачи, чтобы
+    планировщик снова поставил их в очередь.
+
+    Returns:
+        list: ID возвращенных задач
+    """
+    try:
+        session = get_session()
+        expired = [
+            PublishTask.status == TaskStatus.PROCESSING,
+            PublishTask.lease_expires_at != None,
+            PublishTask.lease_expires_at < datetime.now()
+        ]
+        rows = session.query(PublishTask.id, PublishTask.scheduled_time).filter(*expired).all()
+
+        if rows:
+            # Условия аренды проверяются повторно: задачу мог продлить или вернуть другой процесс
+            session.query(PublishTask).filter(
+                PublishTask.id.in_([row.id for row in rows]), *expired
+            ).update({
+                PublishTask.status: TaskStatus.PENDING,
+                PublishTask.lease_owner: None,
+                PublishTask.lease_expires_at: None
+            }, synchronize_session=False)
+            session.commit()
+        session.close()
+
+        if rows:
+            logger.info(f"Возвращено задач с истекшей арендой: {len(rows)}")
+        for row in rows:
+            _notify_task_created(row.id, row.scheduled_time)
+        return [row.id for row in rows]
+    except Exception as e:
+        logger.error(f"Ошибка при возврате задач с истекшей арендой: {e}")
+        return []
+
 def delete_publish_task(task_id):
     """Удаляет задачу на публикацию"""
     try:
@@ -386,6 +689,9 @@ def bulk_add_instagram_accounts(accounts_data):
     """
     Массовое добавление аккаунтов Instagram
 
+    Существующие имена пользователей проверяются одним запросом на пачку,
+    новые аккаунты вставляются одной пакетной вставкой в одной транзакции.
+
     Args:
         accounts_data (list): Список словарей с данными аккаунтов
             [
@@ -393,7 +699,8 @@ def bulk_add_instagram_accounts(accounts_data):
                     "username": "user1",
                     "password": "pass1",
                     "proxy_id": None,  # опционально
-                    "description": ""  # опционально
+                    "description": "",  # опционально
+                    "session_data": None  # опционально, данные сессии в JSON
                 },
                 ...
             ]
@@ -401,37 +708,74 @@ def bulk_add_instagram_accounts(accounts_data):
     Returns:
         tuple: (успешно_добавленные, ошибки)
     """
-    session = get_session()
     success = []
     errors = []
 
+    # Повторы внутри загружаемого списка считаются уже существующими аккаунтами
+    new_accounts = {}
     for data in accounts_data:
-        try:
-            # Проверяем, существует ли уже аккаунт
-            existing = session.query(InstagramAccount).filter_by(username=data["username"]).first()
-            if existing:
-                errors.append((data["username"], "Аккаунт уже существует"))
+        if data["username"] in new_accounts:
+            errors.append((data["username"], "Аккаунт уже существует"))
+        else:
+            new_accounts[data["username"]] = data
+
+    if not new_accounts:
+        return success, errors
+
+    session = get_session()
+    try:
+        for attempt in range(1, BULK_INSERT_ATTEMPTS + 1):
+            # Проверяем, какие аккаунты уже существуют (пачками из-за ограничения SQLite на число параметров)
+            usernames = list(new_accounts.keys())
+            existing = set()
+            for i in range(0, len(usernames), BULK_QUERY_CHUNK_SIZE):
+                chunk = usernames[i:i + BULK_QUERY_CHUNK_SIZE]
+                rows = session.query(InstagramAccount.username).filter(InstagramAccount.username.in_(chunk)).all()
+                existing.update(row.username for row in rows)
+
+            for username in existing:
+                errors.append((username, "Аккаунт уже существует"))
+                del new_accounts[username]
+
+            rows = [
+                {
+                    "username": username,
+                    "password": data["password"],
+                    "is_active": True,
+                    "proxy_id": data.get("proxy_id"),
+                    "email": data.get("email"),
+                    "email_password": data.get("email_password"),
+                    "session_data": data.get("session_data")
+                }
+                for username, data in new_accounts.items()
+            ]
+            if not rows:
+                break
+
+            # Вставляем все новые аккаунты одной транзакцией
+            try:
+                session.execute(InstagramAccount.__table__.insert(), rows)
+                session.commit()
+            except IntegrityError as e:
+                session.rollback()
+                if attempt == BULK_INSERT_ATTEMPTS:
+                    raise
+                # Часть аккаунтов успели добавить параллельно: проверяем заново и повторяем для остальных
+                logger.warning(f"Конфликт при массовом добавлении аккаунтов, повтор ({attempt}): {e}")
                 continue
 
-            # Создаем новый аккаунт
-            account = InstagramAccount(
-                username=data["username"],
-                password=data["password"],
-                is_active=True,
-                proxy_id=data.get("proxy_id"),
-                email=data.get("email"),
-                email_password=data.get("email_password")
-            )
-
-            session.add(account)
-            session.commit()
-            success.append(data["username"])
+            success.extend(row["username"] for row in rows)
+            new_accounts.clear()
+            break
 
-        except Exception as e:
-            session.rollback()
-            errors.append((data["username"], str(e)))
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Ошибка при массовом добавлении аккаунтов: {e}")
+        # Транзакция откатана целиком: ни один из оставшихся новых аккаунтов не добавлен
+        errors.extend((username, str(e)) for username in new_accounts)
+    finally:
+        session.close()
 
-    session.close()
     return success, errors
 
 def update_account_session_data(account_id, session_data):
@@ -455,6 +799,125 @@ def update_account_session_data(account_id, session_data):
         logger.error(f"Ошибка при обновлении данных сессии аккаунта: {e}")
         return False, str(e)
 
+def bulk_update_accounts_active(statuses):
+    """
+    Обновляет признак активности нескольких аккаунтов одной транзакцией
+
+    Args:
+        statuses (dict): {account_id: is_active}
+
+    Returns:
+        tuple: (успех, ошибка)
+    """
+    if not statuses:
+        return True, None
+
+    try:
+        session = get_session()
+        session.bulk_update_mappings(InstagramAccount, [
+            {"id": account_id, "is_active": is_active}
+            for account_id, is_active in statuses.items()
+        ])
+        session.commit()
+        session.close()
+
+        return True, None
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении статуса аккаунтов: {e}")
+        return False, str(e)
+
+def get_media_file_by_source(source_id):
+    """
+    Находит файл хранилища медиа по ID исходного файла в Telegram и отмечает его использование
+
+    Args:
+        source_id (str): file_unique_id файла в Telegram
+
+    Returns:
+        MediaFile: Запись о файле или None
+    """
+    try:
+        session = get_session()
+        media_file = session.query(MediaFile).filter_by(source_id=source_id).first()
+
+        if media_file:
+            media_file.last_accessed = datetime.now()
+            session.commit()
+            session.refresh(media_file)
+
+        session.close()
+        return media_file
+    except Exception as e:
+        logger.error(f"Ошибка при поиске файла в хранилище медиа: {e}")
+        return None
+
+def add_media_file(source_id, sha256, path, size):
+    """
+    Регистрирует файл хранилища медиа (или обновляет существующую запись для source_id)
+
+    Returns:
+        tuple: (успех, ID записи или ошибка)
+    """
+    try:
+        session = get_session()
+        media_file = session.query(MediaFile).filter_by(source_id=source_id).first()
+
+        if not media_file:
+            media_file = MediaFile(source_id=source_id)
+            session.add(media_file)
+
+        media_file.sha256 = sha256
+        media_file.path = path
+        media_file.size = size
+        media_file.last_accessed = datetime.now()
+
+        session.commit()
+        media_file_id = media_file.id
+        session.close()
+
+        return True, media_file_id
+    except Exception as e:
+        logger.error(f"Ошибка при добавлении файла в хранилище медиа: {e}")
+        return False, str(e)
+
+def get_media_reference_counts():
+    """
+    Подсчитывает ссылки на медиафайлы из невыполненных задач на публикацию
+
+    Returns:
+        dict: {media_path: количество ожидающих и выполняющихся задач}
+    """
+    try:
+        session = get_session()
+        rows = session.query(PublishTask.media_path, func.count(PublishTask.id)).filter(
+            PublishTask.status.in_([TaskStatus.PENDING, TaskStatus.PROCESSING])
+        ).group_by(PublishTask.media_path).all()
+        session.close()
+        return {media_path: count for media_path, count in rows}
+    except Exception as e:
+        logger.error(f"Ошибка при подсчете ссылок на медиафайлы: {e}")
+        return None
+
+def delete_media_files(paths):
+    """Удаляет записи о файлах хранилища медиа с указанными путями"""
+    if not paths:
+        return True, None
+
+    try:
+        session = get_session()
+        paths = list(paths)
+        for start in range(0, len(paths), BULK_QUERY_CHUNK_SIZE):
+            session.query(MediaFile).filter(
+                MediaFile.path.in_(paths[start:start + BULK_QUERY_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        session.commit()
+        session.close()
+
+        return True, None
+    except Exception as e:
+        logger.error(f"Ошибка при удалении записей хранилища медиа: {e}")
+        return False, str(e)
+
 def get_active_accounts():
     """Получает список активных аккаунтов Instagram"""
     try:
@@ -1,6 +1,6 @@
 import enum
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -48,8 +48,20 @@ class Proxy(Base):
     # Отношения
     accounts = relationship("InstagramAccount", back_populates="proxy")
 
+    def get_url(self):
+        """Возвращает URL прокси в формате type://[username:password@]host:port"""
+        if self.username and self.password:
+            return f"{self.proxy_type}://{self.username}:{self.password}@{self.host}:{self.port}"
+        return f"{self.proxy_type}://{self.host}:{self.port}"
+
 class PublishTask(Base):
     __tablename__ = 'publish_tasks'
+    __table_args__ = (
+        # Выборка готовых задач планировщиком (get_scheduled_tasks, get_pending_tasks)
+        Index('ix_publish_tasks_status_scheduled_time', 'status', 'scheduled_time'),
+        # Выборка задач аккаунта (get_publish_tasks)
+        Index('ix_publish_tasks_account_id_status', 'account_id', 'status'),
+    )
 
     id = Column(Integer, primary_key=True)
     account_id = Column(Integer, ForeignKey('instagram_accounts.id'), nullable=False)
@@ -62,6 +74,25 @@ class PublishTask(Base):
     scheduled_time = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.now)
     completed_at = Column(DateTime, nullable=True)
+    # Аренда задачи обработчиком: кто взял задачу в работу и до какого времени
+    lease_owner = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    # Количество выполненных шагов задачи (например, опубликованных частей мозаики) для продолжения после сбоя
+    progress = Column(Integer, default=0)
+    # Количество повторов задачи после ошибки
+    attempts = Column(Integer, default=0)
 
     # Отношения
     account = relationship("InstagramAccount", back_populates="tasks")
+
+class MediaFile(Base):
+    """Файл в хранилище медиа, полученный из Telegram"""
+    __tablename__ = 'media_files'
+
+    id = Column(Integer, primary_key=True)
+    source_id = Column(String(255), unique=True, nullable=False)  # file_unique_id файла в Telegram
+    sha256 = Column(String(64), nullable=False, index=True)
+    path = Column(String(255), nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    last_accessed = Column(DateTime, default=datetime.now)
@@ -0,0 +1,104 @@
+import logging
+import concurrent.futures
+
+from config import ACCOUNT_CHECK_CONCURRENCY
+from database.db_manager import get_proxies, bulk_update_accounts_active
+from instagram.session_store import session_store
+from utils.rate_limiter import RateLimitedClient
+
+logger = logging.getLogger(__name__)
+
+# Результаты проверки аккаунта
+STATUS_VALID = 'valid'
+STATUS_CHALLENGE = 'challenge'
+STATUS_INVALID = 'invalid'
+STATUS_ERROR = 'error'
+
+def check_account(account, proxy_url=None):
+    """
+    Проверяет валидность аккаунта Instagram.
+
+    Сначала пробует сохраненную сессию и легкий запрос, и только если
+    сессия не действует, выполняет полный вход.
+
+    Args:
+        account (InstagramAccount): Проверяемый аккаунт
+        proxy_url (str): URL прокси аккаунта (опционально)
+
+    Returns:
+        tuple: (account_id, статус, сообщение)
+    """
+    from instagrapi import Client
+    from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
+
+    try:
+        # Запросы проверки учитываются общим ограничителем частоты (по аккаунту и прокси)
+        client = RateLimitedClient(Client(), account.id)
+        if proxy_url:
+            client.set_proxy(proxy_url)
+
+        settings = session_store.load(account)
+        if settings:
+            try:
+                client.set_settings(settings)
+                client.account_info()
+                return account.id, STATUS_VALID, "Аккаунт валиден (сохраненная сессия)"
+            except Exception as e:
+                logger.info(f"Сохраненная сессия {account.username} недействительна, выполняется вход: {e}")
+                client = RateLimitedClient(Client(), account.id)
+                if proxy_url:
+                    client.set_proxy(proxy_url)
+
+        try:
+            client.login(account.username, account.password)
+            # Сохраняем сессию, чтобы следующая проверка могла ее переиспользовать
+            session_store.save(account.id, client.get_settings(), account.username)
+            return account.id, STATUS_VALID, "Аккаунт валиден"
+
+        except ChallengeRequired:
+            return account.id, STATUS_CHALLENGE, "Требуется подтверждение"
+
+        except (BadPassword, LoginRequired):
+            return account.id, STATUS_INVALID, "Неверные учетные данные"
+
+    except Exception as e:
+        return account.id, STATUS_ERROR, f"Ошибка при проверке - {str(e)}"
+
+def check_accounts_validity(accounts, max_workers=ACCOUNT_CHECK_CONCURRENCY, progress_callback=None):
+    """
+    Параллельно проверяет валидность аккаунтов и одной транзакцией обновляет их статус.
+
+    Args:
+        accounts (list): Проверяемые аккаунты
+        max_workers (int): Количество одновременно проверяемых аккаунтов
+        progress_callback (callable): Функция progress_callback(checked, total),
+            вызываемая после каждого проверенного аккаунта (опционально)
+
+    Returns:
+        list: Результаты (account, статус, сообщение) в порядке исходного списка
+    """
+    proxy_urls = {proxy.id: proxy.get_url() for proxy in get_proxies()}
+
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(check_account, account, proxy_urls.get(account.proxy_id))
+            for account in accounts
+        ]
+
+        for future in concurrent.futures.as_completed(futures):
+            account_id, status, message = future.result()
+            results[account_id] = (status, message)
+
+            if progress_callback:
+                progress_callback(len(results), len(accounts))
+
+    # Статус аккаунтов, которые не удалось проверить из-за ошибки, не меняем
+    statuses = {
+        account_id: status == STATUS_VALID
+        for account_id, (status, _) in results.items()
+        if status != STATUS_ERROR
+    }
+    bulk_update_accounts_active(statuses)
+
+    return [(account, *results[account.id]) for account in accounts]
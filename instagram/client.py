@@ -1,16 +1,105 @@
-import os
-import json
 import logging
+import threading
 import time
-from pathlib import Path
-from instagrapi import Client
-from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
 
-from config import ACCOUNTS_DIR
-from database.db_manager import get_instagram_account, update_account_session_data
+from config import INSTAGRAM_SESSION_CHECK_TTL, SESSION_STATS_LOG_INTERVAL
+from database.db_manager import get_instagram_account
+from instagram.session_store import session_store
+from utils.rate_limiter import RateLimitedClient
 
 logger = logging.getLogger(__name__)
 
+class SessionLivenessCache:
+    """
+    Время последнего успешного запроса с авторизацией для каждого аккаунта.
+
+    Пока сессия аккаунта подтверждалась не раньше ttl секунд назад, она
+    считается активной, и check_login не отправляет проверочный запрос.
+    Проверки без запроса (попадания) и с запросом (промахи) check_login
+    отмечает через record для статистики (stats).
+    """
+
+    def __init__(self, ttl=INSTAGRAM_SESSION_CHECK_TTL):
+        """
+        Args:
+            ttl (int): Сколько сессия считается активной после успешного запроса (в секундах)
+        """
+        self.ttl = ttl
+        self._confirmed_at = {}
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def touch(self, account_id):
+        """Отмечает успешный запрос с авторизацией"""
+        with self._lock:
+            self._confirmed_at[account_id] = time.monotonic()
+
+    def invalidate(self, account_id):
+        """Сбрасывает отметку (сессия больше не действует)"""
+        with self._lock:
+            self._confirmed_at.pop(account_id, None)
+
+    def is_alive(self, account_id):
+        """
+        Проверяет, подтверждалась ли сессия аккаунта в течение ttl.
+
+        Returns:
+            bool: True - сессию можно не проверять, False - нужна проверка
+        """
+        with self._lock:
+            confirmed_at = self._confirmed_at.get(account_id)
+            return confirmed_at is not None and time.monotonic() - confirmed_at < self.ttl
+
+    def record(self, hit):
+        """
+        Учитывает проверку сессии в статистике.
+
+        Args:
+            hit (bool): True - проверка обошлась без запроса к Instagram, False - запрос был нужен
+        """
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self):
+        """
+        Возвращает статистику проверок сессий.
+
+        Returns:
+            dict: {'hits', 'misses', 'hit_rate', 'accounts'}
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0,
+                'accounts': len(self._confirmed_at)
+            }
+
+# Общий кеш активности сессий (общий для всех клиентов, в том числе пересозданных пулом)
+session_liveness = SessionLivenessCache()
+
+def run_session_stats_logger(interval=SESSION_STATS_LOG_INTERVAL, stop_event=None):
+    """
+    Периодически записывает в лог статистику проверок сессий (запускается в отдельном потоке)
+
+    Args:
+        interval (int): Интервал между записями (в секундах)
+        stop_event (threading.Event): Событие остановки (опционально)
+    """
+    stop_event = stop_event or threading.Event()
+
+    while not stop_event.wait(interval):
+        stats = session_liveness.stats()
+        logger.info(
+            f"Проверки сессий: попаданий {stats['hits']}, промахов {stats['misses']} "
+            f"({stats['hit_rate']:.0%} без запроса к Instagram), аккаунтов с активной отметкой: {stats['accounts']}"
+        )
+
 class InstagramClient:
     def __init__(self, account_id):
         """
@@ -19,11 +108,27 @@ class InstagramClient:
         Args:
             account_id (int): ID аккаунта Instagram в базе данных
         """
+        # instagrapi импортируется при создании первого клиента, а не при запуске бота
+        from instagrapi import Client
+
         self.account_id = account_id
         self.account = get_instagram_account(account_id)
-        self.client = Client()
+        # Все запросы клиента проходят через общий ограничитель частоты (по аккаунту и прокси),
+        # а успешные запросы подтверждают, что сессия активна
+        self.client = RateLimitedClient(
+            Client(), account_id,
+            on_success=lambda: session_liveness.touch(account_id),
+            on_error=self._on_request_error
+        )
         self.is_logged_in = False
 
+    def _on_request_error(self, error):
+        """Сбрасывает отметку активности сессии, если Instagram потребовал вход"""
+        from instagrapi.exceptions import LoginRequired, ChallengeRequired
+
+        if isinstance(error, (LoginRequired, ChallengeRequired)):
+            session_liveness.invalidate(self.account_id)
+
     def login(self):
         """
         Выполняет вход в аккаунт Instagram.
@@ -31,33 +136,35 @@ class InstagramClient:
         Returns:
             bool: True, если вход успешен, False в противном случае
         """
+        from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
+
         if not self.account:
             logger.error(f"Аккаунт с ID {self.account_id} не найден")
             return False
 
         try:
             # Пытаемся использовать сохраненную сессию
-            session_file = os.path.join(ACCOUNTS_DIR, str(self.account_id), "session.json")
+            settings = session_store.load(self.account)
             
-            if os.path.exists(session_file):
-                logger.info(f"Найден файл сессии для аккаунта {self.account.username}")
+            if settings:
+                logger.info(f"Найдена сохраненная сессия для аккаунта {self.account.username}")
                 
                 try:
-                    # Загружаем данные сессии
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                    
                     # Устанавливаем настройки клиента из сессии
-                    if 'settings' in session_data:
-                        self.client.set_settings(session_data['settings'])
+                    self.client.set_settings(settings)
                         
                     # Пытаемся использовать сохраненную сессию
                     self.client.login(self.account.username, self.account.password)
                     self.is_logged_in = True
+
+                    # Сохраняем сессию с обновленными cookies
+                    self._save_session()
+
                     logger.info(f"Успешный вход по сохраненной сессии для {self.account.username}")
                     return True
                 except Exception as e:
                     logger.warning(f"Не удалось использовать сохраненную сессию для {self.account.username}: {e}")
+                    session_store.invalidate(self.account_id)
                     # Продолжаем с обычным входом
             
             # Обычный вход
@@ -90,31 +197,7 @@ class InstagramClient:
     def _save_session(self):
         """Сохраняет данные сессии"""
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(self.account_id))
-            os.makedirs(account_dir, exist_ok=True)
-            
-            # Получаем настройки клиента
-            settings = self.client.get_settings()
-            
-            # Формируем данные сессии
-            session_data = {
-                'username': self.account.username,
-                'account_id': self.account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-            
-            # Сохраняем в файл
-            session_file = os.path.join(account_dir, "session.json")
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-            
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(self.account_id, json.dumps(session_data))
-            
-            logger.info(f"Сессия сохранена для пользователя {self.account.username}")
-            
+            session_store.save(self.account_id, self.client.get_settings(), self.account.username)
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {self.account.username}: {e}")
 
@@ -122,18 +205,40 @@ class InstagramClient:
         """
         Проверяет статус входа и выполняет вход при необходимости.
 
+        Если сессия подтверждалась успешным запросом не раньше
+        INSTAGRAM_SESSION_CHECK_TTL секунд назад, запрос к Instagram не
+        отправляется (клиенту, заново созданному пулом, достаточно загрузить
+        сохраненную сессию). Иначе выполняется легкий запрос данных текущего
+        аккаунта.
+
         Returns:
             bool: True, если вход выполнен, False в противном случае
         """
+        if session_liveness.is_alive(self.account_id):
+            if self.is_logged_in:
+                session_liveness.record(hit=True)
+                return True
+
+            settings = session_store.load(self.account) if self.account else None
+            if settings:
+                self.client.set_settings(settings)
+                self.is_logged_in = True
+                session_liveness.record(hit=True)
+                return True
+
+        # Без запроса к Instagram не обойтись: проверка или вход
+        session_liveness.record(hit=False)
+
         if not self.is_logged_in:
             return self.login()
         
         try:
-            # Проверяем, активна ли сессия
-            self.client.get_timeline_feed()
+            # Проверяем, активна ли сессия (успешный запрос обновит отметку активности)
+            self.client.account_info()
             return True
         except Exception:
             # Если сессия не активна, пытаемся войти снова
+            session_liveness.invalidate(self.account_id)
             logger.info(f"Сессия не активна для {self.account.username}, выполняется повторный вход")
             return self.login()
 
@@ -143,6 +248,7 @@ class InstagramClient:
             try:
                 self.client.logout()
                 self.is_logged_in = False
+                session_liveness.invalidate(self.account_id)
                 logger.info(f"Выход выполнен для пользователя {self.account.username}")
                 return True
             except Exception as e:
@@ -161,11 +267,14 @@ def test_instagram_login(username, password):
     Returns:
         bool: True, если вход успешен, False в противном случае
     """
+    from instagrapi import Client
+    from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
+
     try:
         logger.info(f"Тестирование входа для пользователя {username}")
 
-        # Создаем клиент Instagram
-        client = Client()
+        # Создаем клиент Instagram (запросы учитываются ограничителем частоты по имени пользователя)
+        client = RateLimitedClient(Client(), username)
 
         # Пытаемся войти
         client.login(username, password)
@@ -206,33 +315,35 @@ def login_with_session(username, password, account_id):
     Returns:
         Client: Клиент Instagram или None в случае ошибки
     """
+    from instagrapi import Client
+
     try:
         logger.info(f"Вход с сессией для пользователя {username}")
 
-        # Создаем клиент Instagram
-        client = Client()
+        # Создаем клиент Instagram (запросы учитываются общим ограничителем частоты)
+        client = RateLimitedClient(Client(), account_id)
 
-        # Проверяем наличие файла сессии
-        session_file = os.path.join(ACCOUNTS_DIR, str(account_id), "session.json")
+        # Проверяем наличие сохраненной сессии
+        settings = session_store.load(account_id)
         
-        if os.path.exists(session_file):
-            logger.info(f"Найден файл сессии для аккаунта {username}")
+        if settings:
+            logger.info(f"Найдена сохраненная сессия для аккаунта {username}")
             
             try:
-                # Загружаем данные сессии
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                
                 # Устанавливаем настройки клиента из сессии
-                if 'settings' in session_data:
-                    client.set_settings(session_data['settings'])
+                client.set_settings(settings)
                     
                 # Пытаемся использовать сохраненную сессию
                 client.login(username, password)
+
+                # Сохраняем сессию с обновленными cookies
+                session_store.save(account_id, client.get_settings(), username)
+
                 logger.info(f"Успешный вход по сохраненной сессии для {username}")
                 return client
             except Exception as e:
                 logger.warning(f"Не удалось использовать сохраненную сессию для {username}: {e}")
+                session_store.invalidate(account_id)
                 # Продолжаем с обычным входом
         
         # Обычный вход
@@ -240,30 +351,7 @@ def login_with_session(username, password, account_id):
         
         # Сохраняем сессию
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-            os.makedirs(account_dir, exist_ok=True)
-            
-            # Получаем настройки клиента
-            settings = client.get_settings()
-            
-            # Формируем данные сессии
-            session_data = {
-                'username': username,
-                'account_id': account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-            
-            # Сохраняем в файл
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-            
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(account_id, json.dumps(session_data))
-            
-            logger.info(f"Сессия сохранена для пользователя {username}")
-            
+            session_store.save(account_id, client.get_settings(), username)
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {username}: {e}")
         
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import CLIENT_POOL_MAX_SIZE, CLIENT_POOL_IDLE_TIMEOUT
+from instagram.client import InstagramClient
+
+logger = logging.getLogger(__name__)
+
+class InstagramClientPool:
+    """
+    Пул авторизованных клиентов Instagram, ключом служит ID аккаунта.
+
+    Клиент создается при первом обращении и затем переиспользуется,
+    поэтому повторные публикации в один аккаунт не выполняют вход заново.
+    Давно не использовавшиеся клиенты вытесняются из пула.
+    """
+
+    def __init__(self, max_size=CLIENT_POOL_MAX_SIZE, idle_timeout=CLIENT_POOL_IDLE_TIMEOUT):
+        """
+        Args:
+            max_size (int): Максимальное количество клиентов в пуле
+            idle_timeout (int): Время простоя (в секундах), после которого клиент вытесняется
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clients = OrderedDict()  # account_id -> (InstagramClient, время последнего использования)
+        self._account_locks = {}
+        self._lock = threading.Lock()
+
+    def account_lock(self, account_id):
+        """Возвращает блокировку аккаунта (одна операция с аккаунтом в момент времени)"""
+        with self._lock:
+            lock = self._account_locks.get(account_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._account_locks[account_id] = lock
+            return lock
+
+    def get(self, account_id):
+        """
+        Возвращает клиент для аккаунта, создавая его при необходимости.
+
+        Args:
+            account_id (int): ID аккаунта Instagram в базе данных
+
+        Returns:
+            InstagramClient: Клиент аккаунта
+        """
+        with self._lock:
+            self._evict_idle_locked()
+
+            entry = self._clients.get(account_id)
+            if entry is not None:
+                instagram = entry[0]
+                self._clients[account_id] = (instagram, time.monotonic())
+                self._clients.move_to_end(account_id)
+                return instagram
+
+        # Создание клиента читает аккаунт из базы, поэтому выполняется вне общей блокировки
+        instagram = InstagramClient(account_id)
+
+        with self._lock:
+            entry = self._clients.get(account_id)
+            if entry is not None:
+                # Другой поток успел создать клиент раньше
+                instagram = entry[0]
+
+            self._clients[account_id] = (instagram, time.monotonic())
+            self._clients.move_to_end(account_id)
+            self._evict_overflow_locked()
+
+        return instagram
+
+    @contextmanager
+    def lease(self, account_id):
+        """
+        Выдает клиент аккаунта на время операции, удерживая блокировку аккаунта.
+
+        Пример:
+            with client_pool.lease(account_id) as instagram:
+                instagram.client.photo_upload(...)
+        """
+        with self.account_lock(account_id):
+            yield self.get(account_id)
+
+    def evict(self, account_id):
+        """Удаляет клиент аккаунта из пула (например, после удаления аккаунта)"""
+        with self._lock:
+            if self._clients.pop(account_id, None) is not None:
+                logger.info(f"Клиент аккаунта {account_id} удален из пула")
+
+    def evict_idle(self):
+        """Удаляет из пула клиенты, простаивающие дольше idle_timeout"""
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def clear(self):
+        """Очищает пул"""
+        with self._lock:
+            self._clients.clear()
+
+    def size(self):
+        """Возвращает количество клиентов в пуле"""
+        with self._lock:
+            return len(self._clients)
+
+    def _is_busy(self, account_id):
+        lock = self._account_locks.get(account_id)
+        if lock is None:
+            return False
+        if lock.acquire(blocking=False):
+            lock.release()
+            return False
+        return True
+
+    def _evict_idle_locked(self):
+        now = time.monotonic()
+        expired = [
+            account_id for account_id, (_, last_used) in self._clients.items()
+            if now - last_used > self.idle_timeout and not self._is_busy(account_id)
+        ]
+        for account_id in expired:
+            del self._clients[account_id]
+            logger.info(f"Клиент аккаунта {account_id} вытеснен из пула по времени простоя")
+        return len(expired)
+
+    def _evict_overflow_locked(self):
+        # Вытесняем наиболее давно использовавшиеся клиенты, которые сейчас не заняты
+        for account_id in list(self._clients.keys()):
+            if len(self._clients) <= self.max_size:
+                break
+            if self._is_busy(account_id):
+                continue
+            del self._clients[account_id]
+            logger.info(f"Клиент аккаунта {account_id} вытеснен из пула (превышен размер пула)")
+
+# Общий пул клиентов процесса
+client_pool = InstagramClientPool()
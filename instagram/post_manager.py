@@ -1,106 +1,242 @@
 import logging
 import os
+import time
+import concurrent.futures
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from instagram.client import InstagramClient
-from database.db_manager import update_task_status
+from config import INSTAGRAM_CONFIGURE_ATTEMPTS, MOSAIC_RETRY_ATTEMPTS, MOSAIC_RETRY_DELAY
+from instagram.client_pool import client_pool
+from database.db_manager import (
+    update_task_status, update_task_progress, get_publish_task, retry_publish_task
+)
+from utils.progress import progress_bus, STAGE_UPLOAD
+from utils.rate_limiter import publish_rate_limiter, RateLimitedClient
 from utils.image_splitter import split_image_for_mosaic
+from utils.image_batch import prepare_images, INSTAGRAM_PHOTO_SPEC
 
 logger = logging.getLogger(__name__)
 
 class PostManager:
     def __init__(self, account_id):
-        self.instagram = InstagramClient(account_id)
+        self.account_id = account_id
+        # Берем клиент из общего пула, чтобы не выполнять вход заново для каждой задачи
+        self.instagram = client_pool.get(account_id)
 
     def publish_photo(self, photo_path, caption=None):
         """Публикация одиночного фото"""
-        try:
-            # Проверяем статус входа
-            if not self.instagram.check_login():
-                logger.error(f"Не удалось войти в аккаунт для публикации фото")
-                return False, "Ошибка входа в аккаунт"
-
-            # Проверяем существование файла
-            if not os.path.exists(photo_path):
-                logger.error(f"Файл {photo_path} не найден")
-                return False, f"Файл не найден: {photo_path}"
-
-            # Публикуем фото
-            media = self.instagram.client.photo_upload(
-                Path(photo_path),
-                caption=caption or ""
-            )
-
-            logger.info(f"Фото успешно опубликовано: {media.pk}")
-            return True, media.pk
-        except Exception as e:
-            logger.error(f"Ошибка при публикации фото: {e}")
-            return False, str(e)
+        with client_pool.account_lock(self.account_id):
+            try:
+                # Проверяем статус входа
+                if not self.instagram.check_login():
+                    logger.error(f"Не удалось войти в аккаунт для публикации фото")
+                    return False, "Ошибка входа в аккаунт"
+
+                # Проверяем существование файла
+                if not os.path.exists(photo_path):
+                    logger.error(f"Файл {photo_path} не найден")
+                    return False, f"Файл не найден: {photo_path}"
+
+                # Публикуем фото
+                publish_rate_limiter.acquire(self.account_id)
+                media = self.instagram.client.photo_upload(
+                    Path(photo_path),
+                    caption=caption or ""
+                )
+
+                logger.info(f"Фото успешно опубликовано: {media.pk}")
+                return True, media.pk
+            except Exception as e:
+                logger.error(f"Ошибка при публикации фото: {e}")
+                return False, str(e)
 
     def publish_carousel(self, photo_paths, caption=None):
         """Публикация карусели из нескольких фото"""
-        try:
-            # Проверяем статус входа
-            if not self.instagram.check_login():
-                logger.error(f"Не удалось войти в аккаунт для публикации карусели")
-                return False, "Ошибка входа в аккаунт"
-
-            # Проверяем существование файлов
-            paths = [Path(path) for path in photo_paths if os.path.exists(path)]
-            if not paths:
-                logger.error(f"Не найдено ни одного файла для публикации")
-                return False, "Не найдено ни одного файла для публикации"
-
-            # Публикуем карусель
-            media = self.instagram.client.album_upload(
-                paths,
-                caption=caption or ""
-            )
-
-            logger.info(f"Карусель успешно опубликована: {media.pk}")
-            return True, media.pk
-        except Exception as e:
-            logger.error(f"Ошибка при публикации карусели: {e}")
-            return False, str(e)
+        with client_pool.account_lock(self.account_id):
+            try:
+                # Проверяем статус входа
+                if not self.instagram.check_login():
+                    logger.error(f"Не удалось войти в аккаунт для публикации карусели")
+                    return False, "Ошибка входа в аккаунт"
 
-    def publish_mosaic(self, image_path, caption=None):
-        """Публикация мозаики из 6 частей"""
-        try:
-            # Проверяем статус входа
-            if not self.instagram.check_login():
-                logger.error(f"Не удалось войти в аккаунт для публикации мозаики")
-                return False, "Ошибка входа в аккаунт"
-
-            # Проверяем существование файла
-            if not os.path.exists(image_path):
-                logger.error(f"Файл {image_path} не найден")
-                return False, f"Файл не найден: {image_path}"
-
-            # Разделяем изображение на 6 частей
-            split_images = split_image_for_mosaic(image_path)
-            if not split_images:
-                logger.error(f"Не удалось разделить изображение на части")
-                return False, "Не удалось разделить изображение на части"
-
-            # Публикуем части в обратном порядке (чтобы в профиле они отображались правильно)
-            for i, img_path in enumerate(reversed(split_images)):
-                # Для первой публикации используем указанное описание, для остальных - пустое
-                part_caption = caption if i == 0 else ""
-
-                success, result = self.publish_photo(img_path, part_caption)
-                if not success:
-                    logger.error(f"Ошибка при публикации части {i+1} мозаики: {result}")
-                    return False, f"Ошибка при публикации части {i+1} мозаики: {result}"
-
-                # Небольшая пауза между публикациями
-                import time
-                time.sleep(5)
-
-            logger.info(f"Мозаика успешно опубликована")
-            return True, None
-        except Exception as e:
-            logger.error(f"Ошибка при публикации мозаики: {e}")
-            return False, str(e)
+                # Проверяем существование файлов
+                photo_paths = [path for path in photo_paths if os.path.exists(path)]
+                if not photo_paths:
+                    logger.error(f"Не найдено ни одного файла для публикации")
+                    return False, "Не найдено ни одного файла для публикации"
+
+                # Подготавливаем все фото параллельно; если фото подготовить не удалось, публикуем исходное
+                prepared = prepare_images([(path, INSTAGRAM_PHOTO_SPEC) for path in photo_paths])
+                paths = [
+                    Path(result[0] if success else path)
+                    for path, (success, result) in zip(photo_paths, prepared)
+                ]
+
+                # Публикуем карусель
+                publish_rate_limiter.acquire(self.account_id)
+                media = self.instagram.client.album_upload(
+                    paths,
+                    caption=caption or ""
+                )
+
+                logger.info(f"Карусель успешно опубликована: {media.pk}")
+                return True, media.pk
+            except Exception as e:
+                logger.error(f"Ошибка при публикации карусели: {e}")
+                return False, str(e)
+
+    def _create_upload_client(self):
+        """
+        Создает отдельный клиент для фоновой загрузки частей мозаики.
+
+        Клиент instagrapi не потокобезопасен (ответ запроса сохраняется в
+        общем состоянии клиента), поэтому загрузка в фоновом потоке идет
+        через свой клиент с той же сессией и тем же прокси.
+        """
+        from instagrapi import Client
+
+        upload_client = RateLimitedClient(Client(), self.account_id)
+        upload_client.set_settings(self.instagram.client.get_settings())
+
+        proxy = getattr(self.instagram.client, 'proxy', None)
+        if proxy:
+            upload_client.set_proxy(proxy)
+        return upload_client
+
+    def _upload_tile(self, upload_client, tile_path):
+        """Загружает часть мозаики без публикации и возвращает (upload_id, ширина, высота)"""
+        return upload_client.photo_rupload(Path(tile_path))
+
+    def _configure_tile(self, upload_id, width, height, caption):
+        """
+        Публикует загруженную часть мозаики.
+
+        Instagram обрабатывает загруженное фото не сразу, поэтому при ошибке
+        публикация повторяется с увеличивающейся паузой.
+        """
+        from instagrapi.extractors import extract_media_v1
+
+        for attempt in range(1, INSTAGRAM_CONFIGURE_ATTEMPTS + 1):
+            try:
+                result = self.instagram.client.photo_configure(upload_id, width, height, caption)
+                if result and result.get('media'):
+                    return extract_media_v1(result['media'])
+                error = "Instagram не вернул опубликованное фото"
+            except Exception as e:
+                if attempt == INSTAGRAM_CONFIGURE_ATTEMPTS:
+                    raise
+                error = e
+
+            logger.warning(f"Попытка {attempt} публикации фото {upload_id} не удалась: {error}")
+            time.sleep(2 ** (attempt - 1))
+
+        raise RuntimeError(f"Не удалось опубликовать фото после {INSTAGRAM_CONFIGURE_ATTEMPTS} попыток")
+
+    def publish_mosaic(self, image_path, caption=None, task_id=None, start_from=0):
+        """
+        Публикация мозаики из 6 частей
+
+        Части публикуются конвейером: пока публикуется одна часть, следующая
+        уже загружается отдельным клиентом с той же сессией. Интервал между публикациями задает общий ограничитель
+        частоты аккаунта. После каждой опубликованной части прогресс
+        сохраняется в задаче, и при повторном выполнении задачи публикация
+        продолжается со следующей части.
+
+        Args:
+            image_path (str): Путь к изображению
+            caption (str): Описание (добавляется к первой публикуемой части)
+            task_id (int): ID задачи для сохранения прогресса (опционально)
+            start_from (int): Сколько частей уже опубликовано
+
+        Returns:
+            tuple: (успех, ошибка)
+        """
+        with client_pool.account_lock(self.account_id):
+            split_images = []
+            published = start_from
+            try:
+                # Проверяем статус входа (один раз для всей мозаики)
+                if not self.instagram.check_login():
+                    logger.error(f"Не удалось войти в аккаунт для публикации мозаики")
+                    return False, "Ошибка входа в аккаунт"
+
+                # Проверяем существование файла
+                if not os.path.exists(image_path):
+                    logger.error(f"Файл {image_path} не найден")
+                    return False, f"Файл не найден: {image_path}"
+
+                # Разделяем изображение на 6 частей (результат для одного изображения всегда одинаковый)
+                split_images = split_image_for_mosaic(image_path)
+                if not split_images:
+                    logger.error(f"Не удалось разделить изображение на части")
+                    return False, "Не удалось разделить изображение на части"
+
+                # Публикуем части в обратном порядке (чтобы в профиле они отображались правильно)
+                tiles = list(reversed(split_images))
+                total = len(tiles)
+                if published:
+                    logger.info(f"Продолжение публикации мозаики с части {published + 1} из {total}")
+
+                upload_client = self._create_upload_client()
+
+                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as uploader:
+                    next_upload = uploader.submit(self._upload_tile, upload_client, tiles[published]) if published < total else None
+
+                    while published < total:
+                        upload_id, width, height = next_upload.result()
+
+                        # Загружаем следующую часть, пока публикуется текущая
+                        if published + 1 < total:
+                            next_upload = uploader.submit(self._upload_tile, upload_client, tiles[published + 1])
+
+                        # Для первой публикации используем указанное описание, для остальных - пустое
+                        part_caption = (caption or "") if published == 0 else ""
+
+                        publish_rate_limiter.acquire(self.account_id)
+                        media = self._configure_tile(upload_id, width, height, part_caption)
+
+                        published += 1
+                        if task_id is not None:
+                            update_task_progress(task_id, published)
+                        progress_bus.emit(task_id, STAGE_UPLOAD, percent=published * 100 // total,
+                                          message=f"Опубликовано частей: {published} из {total}")
+                        logger.info(f"Часть {published} из {total} мозаики опубликована: {media.pk}")
+
+                logger.info(f"Мозаика успешно опубликована")
+                return True, None
+            except Exception as e:
+                logger.error(f"Ошибка при публикации части {published + 1} мозаики: {e}")
+                return False, f"Ошибка при публикации части {published + 1} мозаики: {e}"
+            finally:
+                # Части создаются заново при каждом выполнении задачи
+                for tile_path in split_images:
+                    if os.path.exists(tile_path):
+                        os.remove(tile_path)
+
+    def _retry_partial_mosaic(self, task, error):
+        """
+        Возвращает в очередь частично опубликованную мозаику, чтобы продолжить ее со следующей части.
+
+        Повторы выполняются не больше MOSAIC_RETRY_ATTEMPTS раз с удваивающейся паузой.
+
+        Returns:
+            bool: True, если задача возвращена в очередь
+        """
+        current = get_publish_task(task.id)
+        if not current or not current.progress:
+            return False
+
+        attempts = current.attempts or 0
+        if attempts >= MOSAIC_RETRY_ATTEMPTS:
+            return False
+
+        retry_time = datetime.now() + timedelta(seconds=MOSAIC_RETRY_DELAY * 2 ** attempts)
+        if not retry_publish_task(task.id, retry_time, error_message=error):
+            return False
+
+        logger.warning(f"Мозаика {task.id} опубликована частично (частей: {current.progress}), "
+                       f"повтор {attempts + 1} из {MOSAIC_RETRY_ATTEMPTS} в {retry_time:%H:%M:%S}: {error}")
+        return True
 
     def execute_post_task(self, task):
         """Выполнение задачи по публикации поста"""
@@ -112,7 +248,9 @@ class PostManager:
             if task.task_type == 'post':
                 success, result = self.publish_photo(task.media_path, task.caption)
             elif task.task_type == 'mosaic':
-                success, result = self.publish_mosaic(task.media_path, task.caption)
+                success, result = self.publish_mosaic(
+                    task.media_path, task.caption, task_id=task.id, start_from=task.progress or 0
+                )
             else:
                 logger.error(f"Неизвестный тип задачи: {task.task_type}")
                 update_task_status(task.id, 'failed', error_message=f"Неизвестный тип задачи: {task.task_type}")
@@ -123,6 +261,10 @@ class PostManager:
                 logger.info(f"Задача {task.id} по публикации {task.task_type} выполнена успешно")
                 return True, None
             else:
+                # Часть мозаики уже в профиле: продолжаем позже, а не публикуем заново
+                if task.task_type == 'mosaic' and self._retry_partial_mosaic(task, result):
+                    return False, result
+
                 update_task_status(task.id, 'failed', error_message=result)
                 logger.error(f"Задача {task.id} по публикации {task.task_type} не выполнена: {result}")
                 return False, result
@@ -2,37 +2,40 @@ import logging
 import os
 from pathlib import Path
 
-from instagram.client import InstagramClient
+from instagram.client_pool import client_pool
 from database.db_manager import update_task_status
 
 logger = logging.getLogger(__name__)
 
 class ProfileManager:
     def __init__(self, account_id):
-        self.instagram = InstagramClient(account_id)
+        self.account_id = account_id
+        # Берем клиент из общего пула, чтобы не выполнять вход заново для каждой задачи
+        self.instagram = client_pool.get(account_id)
 
     def update_profile(self, biography=None, avatar_path=None):
         """Обновление профиля Instagram"""
-        try:
-            # Проверяем статус входа
-            if not self.instagram.check_login():
-                logger.error(f"Не удалось войти в аккаунт для обновления профиля")
-                return False, "Ошибка входа в аккаунт"
-
-            # Обновляем биографию, если указана
-            if biography:
-                self.instagram.client.account_edit(biography=biography)
-                logger.info(f"Биография обновлена для {self.instagram.account.username}")
-
-            # Обновляем аватар, если указан
-            if avatar_path and os.path.exists(avatar_path):
-                self.instagram.client.account_change_picture(Path(avatar_path))
-                logger.info(f"Аватар обновлен для {self.instagram.account.username}")
-
-            return True, None
-        except Exception as e:
-            logger.error(f"Ошибка при обновлении профиля: {e}")
-            return False, str(e)
+        with client_pool.account_lock(self.account_id):
+            try:
+                # Проверяем статус входа
+                if not self.instagram.check_login():
+                    logger.error(f"Не удалось войти в аккаунт для обновления профиля")
+                    return False, "Ошибка входа в аккаунт"
+
+                # Обновляем биографию, если указана
+                if biography:
+                    self.instagram.client.account_edit(biography=biography)
+                    logger.info(f"Биография обновлена для {self.instagram.account.username}")
+
+                # Обновляем аватар, если указан
+                if avatar_path and os.path.exists(avatar_path):
+                    self.instagram.client.account_change_picture(Path(avatar_path))
+                    logger.info(f"Аватар обновлен для {self.instagram.account.username}")
+
+                return True, None
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении профиля: {e}")
+                return False, str(e)
 
     def execute_profile_task(self, task):
         """Выполнение задачи по обновлению профиля"""
@@ -3,41 +3,56 @@ import os
 from pathlib import Path
 import concurrent.futures
 
-from instagram.client import InstagramClient
+from instagram.client_pool import client_pool
 from database.db_manager import update_task_status, get_instagram_accounts
 from config import MAX_WORKERS
+from utils.progress import progress_bus, STAGE_UPLOAD, STAGE_DONE, STAGE_ERROR
+from utils.rate_limiter import publish_rate_limiter
 
 logger = logging.getLogger(__name__)
 
 class ReelsManager:
     def __init__(self, account_id):
-        self.instagram = InstagramClient(account_id)
+        self.account_id = account_id
+        # Берем клиент из общего пула, чтобы не выполнять вход заново для каждой задачи
+        self.instagram = client_pool.get(account_id)
 
-    def publish_reel(self, video_path, caption=None, thumbnail_path=None):
-        """Публикация видео в Reels"""
-        try:
-            # Проверяем статус входа
-            if not self.instagram.check_login():
-                logger.error(f"Не удалось войти в аккаунт для публикации Reels")
-                return False, "Ошибка входа в аккаунт"
+    def publish_reel(self, video_path, caption=None, thumbnail_path=None, task_id=None):
+        """
+        Публикация видео в Reels
 
-            # Проверяем существование файла
-            if not os.path.exists(video_path):
-                logger.error(f"Файл {video_path} не найден")
-                return False, f"Файл не найден: {video_path}"
+        Ход публикации отправляется в шину событий задачи task_id (если указана).
+        """
+        with client_pool.account_lock(self.account_id):
+            try:
+                # Проверяем статус входа
+                if not self.instagram.check_login():
+                    logger.error(f"Не удалось войти в аккаунт для публикации Reels")
+                    progress_bus.emit(task_id, STAGE_ERROR, message="Ошибка входа в аккаунт")
+                    return False, "Ошибка входа в аккаунт"
 
-            # Публикуем Reels
-            media = self.instagram.client.clip_upload(
-                Path(video_path),
-                caption=caption or "",
-                thumbnail=Path(thumbnail_path) if thumbnail_path and os.path.exists(thumbnail_path) else None
-            )
-
-            logger.info(f"Reels успешно опубликован: {media.pk}")
-            return True, media.pk
-        except Exception as e:
-            logger.error(f"Ошибка при публикации Reels: {e}")
-            return False, str(e)
+                # Проверяем существование файла
+                if not os.path.exists(video_path):
+                    logger.error(f"Файл {video_path} не найден")
+                    progress_bus.emit(task_id, STAGE_ERROR, message=f"Файл не найден: {video_path}")
+                    return False, f"Файл не найден: {video_path}"
+
+                # Публикуем Reels
+                progress_bus.emit(task_id, STAGE_UPLOAD)
+                publish_rate_limiter.acquire(self.account_id)
+                media = self.instagram.client.clip_upload(
+                    Path(video_path),
+                    caption=caption or "",
+                    thumbnail=Path(thumbnail_path) if thumbnail_path and os.path.exists(thumbnail_path) else None
+                )
+
+                logger.info(f"Reels успешно опубликован: {media.pk}")
+                progress_bus.emit(task_id, STAGE_DONE)
+                return True, media.pk
+            except Exception as e:
+                logger.error(f"Ошибка при публикации Reels: {e}")
+                progress_bus.emit(task_id, STAGE_ERROR, message=str(e))
+                return False, str(e)
 
     def execute_reel_task(self, task):
         """Выполнение задачи по публикации Reels"""
@@ -46,7 +61,7 @@ class ReelsManager:
             update_task_status(task.id, 'processing')
 
             # Публикуем Reels
-            success, result = self.publish_reel(task.media_path, task.caption)
+            success, result = self.publish_reel(task.media_path, task.caption, task_id=task.id)
 
             if success:
                 update_task_status(task.id, 'completed')
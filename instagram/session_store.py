@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from config import ACCOUNTS_DIR, SESSION_FILE_MIRROR
+from database.db_manager import get_instagram_account, update_account_session_data
+
+logger = logging.getLogger(__name__)
+
+def serialize_session(username, settings, account_id=None):
+    """
+    Формирует данные сессии для сохранения в базе (колонка session_data)
+
+    Args:
+        username (str): Имя пользователя Instagram
+        settings (dict): Настройки клиента instagrapi (get_settings)
+        account_id (int): ID аккаунта (неизвестен, если аккаунт еще не добавлен в базу)
+
+    Returns:
+        str: Данные сессии в JSON
+    """
+    return json.dumps({
+        'username': username,
+        'account_id': account_id,
+        'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'settings': settings
+    })
+
+class SessionStore:
+    """
+    Единое хранилище сессий Instagram.
+
+    Источник истины - колонка instagram_accounts.session_data. Разобранные
+    сессии кешируются в памяти вместе с исходными данными: при каждом
+    чтении запись аккаунта сверяется с базой, и JSON разбирается заново,
+    только если сессию изменил другой процесс. При включенном SESSION_FILE_MIRROR копия сессии записывается
+    в data/accounts/<id>/session.json через временный файл, так что файл
+    никогда не бывает записан наполовину. Сессии, которые есть только в
+    файле (сохраненные до появления хранилища), при первом чтении
+    переносятся в базу.
+    """
+
+    def __init__(self, accounts_dir=ACCOUNTS_DIR, file_mirror=SESSION_FILE_MIRROR):
+        """
+        Args:
+            accounts_dir (str): Директория файлов сессий
+            file_mirror (bool): Дублировать сессии в файлы
+        """
+        self.accounts_dir = str(accounts_dir)
+        self.file_mirror = file_mirror
+        self._settings = {}
+        self._lock = threading.Lock()
+
+    def _session_file(self, account_id):
+        return os.path.join(self.accounts_dir, str(account_id), "session.json")
+
+    def _write_file(self, account_id, data):
+        """Атомарно записывает копию сессии в файл"""
+        session_file = self._session_file(account_id)
+        tmp_file = f"{session_file}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(session_file), exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                f.write(data)
+            os.replace(tmp_file, session_file)
+        except Exception as e:
+            logger.warning(f"Не удалось записать файл сессии аккаунта {account_id}: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _read_file(self, account_id):
+        """Возвращает данные сессии из файла (JSON) или None"""
+        session_file = self._session_file(account_id)
+        if not os.path.exists(session_file):
+            return None
+        with open(session_file, 'r') as f:
+            return f.read()
+
+    def load(self, account):
+        """
+        Возвращает настройки сессии аккаунта для client.set_settings.
+
+        Args:
+            account: Аккаунт (InstagramAccount) или его ID
+
+        Returns:
+            dict: Настройки клиента instagrapi или None, если сессии нет
+        """
+        account_id = getattr(account, 'id', account)
+
+        # Переданный объект мог устареть, поэтому сессию всегда сверяем с базой
+        account = get_instagram_account(account_id)
+        data = account.session_data if account else None
+
+        with self._lock:
+            cached = self._settings.get(account_id)
+        if cached and data and cached[0] == data:
+            return cached[1]
+
+        try:
+            from_file = False
+            if not data:
+                data = self._read_file(account_id)
+                from_file = data is not None
+            if not data:
+                return None
+
+            settings = json.loads(data).get('settings')
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать сессию аккаунта {account_id}: {e}")
+            return None
+
+        if from_file and settings and account:
+            # Сессия сохранена до появления хранилища: переносим ее в базу
+            update_account_session_data(account_id, data)
+            logger.info(f"Сессия аккаунта {account.username} перенесена из файла в базу")
+
+        with self._lock:
+            self._settings[account_id] = (data, settings)
+        return settings
+
+    def save(self, account_id, settings, username=None):
+        """
+        Сохраняет сессию аккаунта в базу, кеш и файл (если включено дублирование).
+
+        Args:
+            account_id (int): ID аккаунта
+            settings (dict): Настройки клиента instagrapi (get_settings)
+            username (str): Имя пользователя Instagram
+
+        Returns:
+            bool: Успешно ли сессия сохранена в базе
+        """
+        data = serialize_session(username, settings, account_id)
+
+        success, error = update_account_session_data(account_id, data)
+        if not success:
+            logger.error(f"Ошибка при сохранении сессии аккаунта {account_id}: {error}")
+            return False
+
+        with self._lock:
+            self._settings[account_id] = (data, settings)
+
+        if self.file_mirror:
+            self._write_file(account_id, data)
+
+        logger.info(f"Сессия сохранена для аккаунта {username or account_id}")
+        return True
+
+    def invalidate(self, account_id):
+        """Удаляет сессию аккаунта из кеша (например, если Instagram ее отклонил)"""
+        with self._lock:
+            self._settings.pop(account_id, None)
+
+    def delete(self, account_id):
+        """Удаляет сессию аккаунта из кеша и файл сессии (запись в базе удаляется вместе с аккаунтом)"""
+        self.invalidate(account_id)
+
+        session_file = self._session_file(account_id)
+        if os.path.exists(session_file):
+            os.remove(session_file)
+
+    def clear_cache(self):
+        """Очищает кеш сессий в памяти"""
+        with self._lock:
+            self._settings.clear()
+
+# Общее хранилище сессий Instagram
+session_store = SessionStore()
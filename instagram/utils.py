@@ -1,9 +1,13 @@
 import os
+import json
 import logging
 import tempfile
+import subprocess
 from pathlib import Path
 from PIL import Image
 
+from config import FFPROBE_BINARY, FFPROBE_TIMEOUT
+
 logger = logging.getLogger(__name__)
 
 def optimize_image_for_instagram(image_path, max_size=(1080, 1350), quality=95):
@@ -83,6 +87,86 @@ def validate_video_for_reels(video_path):
         logger.error(f"Ошибка при проверке видео {video_path}: {e}")
         return False, f"Ошибка при проверке видео: {e}"
 
+def probe_video(video_path):
+    """
+    Читает метаданные контейнера и потоков видео с помощью ffprobe без декодирования кадров
+
+    Args:
+        video_path: Путь к видеофайлу
+
+    Returns:
+        dict: {'format', 'duration', 'width', 'height', 'video_codec', 'audio_codec'}
+            или None, если метаданные прочитать не удалось
+    """
+    try:
+        result = subprocess.run(
+            [
+                FFPROBE_BINARY, '-v', 'error',
+                '-show_entries', 'format=format_name,duration:stream=codec_type,codec_name,width,height:stream_tags=rotate:stream_side_data=rotation',
+                '-of', 'json',
+                str(video_path)
+            ],
+            capture_output=True,
+            timeout=FFPROBE_TIMEOUT,
+            check=True
+        )
+        data = json.loads(result.stdout)
+
+        streams = data.get('streams', [])
+        video_stream = next((s for s in streams if s.get('codec_type') == 'video'), None)
+        audio_stream = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+        if not video_stream:
+            return None
+
+        width = int(video_stream.get('width', 0))
+        height = int(video_stream.get('height', 0))
+
+        # Видео с телефонов часто хранится повернутым, с углом поворота в метаданных
+        rotation = video_stream.get('tags', {}).get('rotate')
+        for side_data in video_stream.get('side_data_list', []):
+            if 'rotation' in side_data:
+                rotation = side_data['rotation']
+        if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+            width, height = height, width
+
+        return {
+            'format': data.get('format', {}).get('format_name', ''),
+            'duration': float(data.get('format', {}).get('duration', 0)),
+            'width': width,
+            'height': height,
+            'video_codec': video_stream.get('codec_name'),
+            'audio_codec': audio_stream.get('codec_name') if audio_stream else None
+        }
+
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать метаданные видео {video_path}: {e}")
+        return None
+
+def is_reels_compliant(info, target_ratio=9/16, max_duration=90, ratio_tolerance=0.1):
+    """
+    Проверяет, можно ли опубликовать видео в Reels без перекодирования
+
+    Args:
+        info: Метаданные видео (результат probe_video)
+        target_ratio: Требуемое соотношение сторон
+        max_duration: Максимальная длительность (в секундах)
+        ratio_tolerance: Допустимое отклонение соотношения сторон
+
+    Returns:
+        bool: True, если видео уже соответствует требованиям Reels
+    """
+    if not info or not info['width'] or not info['height']:
+        return False
+
+    formats = info['format'].split(',')
+    return (
+        ('mp4' in formats or 'mov' in formats)
+        and info['video_codec'] == 'h264'
+        and info['audio_codec'] in ('aac', None)
+        and 0 < info['duration'] <= max_duration
+        and abs(info['width'] / info['height'] - target_ratio) <= ratio_tolerance
+    )
+
 def get_media_type(file_path):
     """
     Определяет тип медиафайла по расширению
@@ -1,13 +1,10 @@
-import os
-import json
 import logging
-import time
-from pathlib import Path
 from instagrapi import Client
 from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
 
-from config import ACCOUNTS_DIR
-from database.db_manager import get_instagram_account, update_account_session_data
+from database.db_manager import get_instagram_account
+from instagram.session_store import session_store
+from utils.rate_limiter import RateLimitedClient
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +18,8 @@ class InstagramClient:
         """
         self.account_id = account_id
         self.account = get_instagram_account(account_id)
-        self.client = Client()
+        # Все запросы клиента проходят через общий ограничитель частоты (по аккаунту и прокси)
+        self.client = RateLimitedClient(Client(), account_id)
         self.is_logged_in = False
 
     def login(self):
@@ -37,27 +35,27 @@ class InstagramClient:
 
         try:
             # Пытаемся использовать сохраненную сессию
-            session_file = os.path.join(ACCOUNTS_DIR, str(self.account_id), "session.json")
+            settings = session_store.load(self.account)
             
-            if os.path.exists(session_file):
-                logger.info(f"Найден файл сессии для аккаунта {self.account.username}")
+            if settings:
+                logger.info(f"Найдена сохраненная сессия для аккаунта {self.account.username}")
                 
                 try:
-                    # Загружаем данные сессии
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                    
                     # Устанавливаем настройки клиента из сессии
-                    if 'settings' in session_data:
-                        self.client.set_settings(session_data['settings'])
+                    self.client.set_settings(settings)
                         
                     # Пытаемся использовать сохраненную сессию
                     self.client.login(self.account.username, self.account.password)
                     self.is_logged_in = True
+
+                    # Сохраняем сессию с обновленными cookies
+                    self._save_session()
+
                     logger.info(f"Успешный вход по сохраненной сессии для {self.account.username}")
                     return True
                 except Exception as e:
                     logger.warning(f"Не удалось использовать сохраненную сессию для {self.account.username}: {e}")
+                    session_store.invalidate(self.account_id)
                     # Продолжаем с обычным входом
             
             # Обычный вход
@@ -90,31 +88,7 @@ class InstagramClient:
     def _save_session(self):
         """Сохраняет данные сессии"""
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(self.account_id))
-            os.makedirs(account_dir, exist_ok=True)
-            
-            # Получаем настройки клиента
-            settings = self.client.get_settings()
-            
-            # Формируем данные сессии
-            session_data = {
-                'username': self.account.username,
-                'account_id': self.account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-            
-            # Сохраняем в файл
-            session_file = os.path.join(account_dir, "session.json")
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-            
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(self.account_id, json.dumps(session_data))
-            
-            logger.info(f"Сессия сохранена для пользователя {self.account.username}")
-            
+            session_store.save(self.account_id, self.client.get_settings(), self.account.username)
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {self.account.username}: {e}")
 
@@ -164,8 +138,8 @@ def test_instagram_login(username, password):
     try:
         logger.info(f"Тестирование входа для пользователя {username}")
 
-        # Создаем клиент Instagram
-        client = Client()
+        # Создаем клиент Instagram (запросы учитываются ограничителем частоты по имени пользователя)
+        client = RateLimitedClient(Client(), username)
 
         # Пытаемся войти
         client.login(username, password)
@@ -209,30 +183,30 @@ def login_with_session(username, password, account_id):
     try:
         logger.info(f"Вход с сессией для пользователя {username}")
 
-        # Создаем клиент Instagram
-        client = Client()
+        # Создаем клиент Instagram (запросы учитываются общим ограничителем частоты)
+        client = RateLimitedClient(Client(), account_id)
 
-        # Проверяем наличие файла сессии
-        session_file = os.path.join(ACCOUNTS_DIR, str(account_id), "session.json")
+        # Проверяем наличие сохраненной сессии
+        settings = session_store.load(account_id)
         
-        if os.path.exists(session_file):
-            logger.info(f"Найден файл сессии для аккаунта {username}")
+        if settings:
+            logger.info(f"Найдена сохраненная сессия для аккаунта {username}")
             
             try:
-                # Загружаем данные сессии
-                with open(session_file, 'r') as f:
-                    session_data = json.load(f)
-                
                 # Устанавливаем настройки клиента из сессии
-                if 'settings' in session_data:
-                    client.set_settings(session_data['settings'])
+                client.set_settings(settings)
                     
                 # Пытаемся использовать сохраненную сессию
                 client.login(username, password)
+
+                # Сохраняем сессию с обновленными cookies
+                session_store.save(account_id, client.get_settings(), username)
+
                 logger.info(f"Успешный вход по сохраненной сессии для {username}")
                 return client
             except Exception as e:
                 logger.warning(f"Не удалось использовать сохраненную сессию для {username}: {e}")
+                session_store.invalidate(account_id)
                 # Продолжаем с обычным входом
         
         # Обычный вход
@@ -240,30 +214,7 @@ def login_with_session(username, password, account_id):
         
         # Сохраняем сессию
         try:
-            # Создаем директорию для аккаунта, если она не существует
-            account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-            os.makedirs(account_dir, exist_ok=True)
-            
-            # Получаем настройки клиента
-            settings = client.get_settings()
-            
-            # Формируем данные сессии
-            session_data = {
-                'username': username,
-                'account_id': account_id,
-                'last_login': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'settings': settings
-            }
-            
-            # Сохраняем в файл
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f)
-            
-            # Обновляем данные сессии в базе данных
-            update_account_session_data(account_id, json.dumps(session_data))
-            
-            logger.info(f"Сессия сохранена для пользователя {username}")
-            
+            session_store.save(account_id, client.get_settings(), username)
         except Exception as e:
             logger.error(f"Ошибка при сохранении сессии для {username}: {e}")
         
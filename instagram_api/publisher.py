@@ -1,94 +1,197 @@
 import os
+import time
 import logging
-import tempfile
 from datetime import datetime
 
-from instagrapi import Client
-import moviepy.editor
-VideoFileClip = moviepy.editor.VideoFileClip
-
-from config import ACCOUNTS_DIR
-from database.db_manager import get_session, get_instagram_account, update_publish_task_status
+from config import VIDEO_ENCODING_PROFILES, VIDEO_ENCODING_PROFILE
+from database.db_manager import get_session, update_publish_task_status
 from database.models import PublishTask, TaskStatus
+from instagram.client_pool import client_pool
+from instagram.utils import probe_video, is_reels_compliant
+from utils.progress import progress_bus, STAGE_ENCODE, STAGE_UPLOAD, STAGE_DONE, STAGE_ERROR
+from utils.media_store import media_store
+from utils.rate_limiter import publish_rate_limiter
+from utils.video_cache import video_cache
 
 logger = logging.getLogger(__name__)
 
 def get_instagram_client(account_id):
     """Получает клиент Instagram для указанного аккаунта"""
-    session = get_session()
-    account = get_instagram_account(account_id)
+    # Клиент берется из общего пула: повторный вход выполняется, только если сессия не активна
+    instagram = client_pool.get(account_id)
 
-    if not account:
+    if not instagram.account:
         logger.error(f"Аккаунт с ID {account_id} не найден")
+        client_pool.evict(account_id)
         return None, "Аккаунт не найден"
 
-    client = Client()
+    if not instagram.check_login():
+        logger.error(f"Ошибка при входе в аккаунт {instagram.account.username}")
+        return None, "Ошибка входа в аккаунт"
 
-    # Проверяем наличие сессии
-    session_file = os.path.join(ACCOUNTS_DIR, str(account_id), 'session.json')
-    if os.path.exists(session_file):
-        try:
-            client.load_settings(session_file)
-            logger.info(f"Загружены настройки для аккаунта {account.username}")
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке настроек: {e}")
+    return instagram.client, None
 
-    # Выполняем вход
-    try:
-        client.login(account.username, account.password)
-        logger.info(f"Успешный вход в аккаунт {account.username}")
+# Параметры обработки видео для Reels (входят в ключ кеша обработанных видео)
+REELS_TARGET_RATIO = 9/16
+REELS_MAX_DURATION = 90
+REELS_VIDEO_CODEC = 'libx264'
+REELS_AUDIO_CODEC = 'aac'
 
-        # Сохраняем сессию
-        os.makedirs(os.path.join(ACCOUNTS_DIR, str(account_id)), exist_ok=True)
-        client.dump_settings(session_file)
+def get_encoding_profile(name=None):
+    """
+    Возвращает параметры профиля кодирования видео
 
-        return client, None
-    except Exception as e:
-        logger.error(f"Ошибка при входе в аккаунт {account.username}: {e}")
-        return None, str(e)
+    Args:
+        name: Название профиля из VIDEO_ENCODING_PROFILES (по умолчанию VIDEO_ENCODING_PROFILE)
+
+    Returns:
+        dict: Параметры профиля
+    """
+    name = name or VIDEO_ENCODING_PROFILE
+    if name not in VIDEO_ENCODING_PROFILES:
+        logger.warning(f"Неизвестный профиль кодирования {name}, используется {VIDEO_ENCODING_PROFILE}")
+        name = VIDEO_ENCODING_PROFILE
+    return dict(VIDEO_ENCODING_PROFILES[name], name=name)
+
+def _encode_progress_logger(task_id):
+    """Создает logger moviepy, отправляющий процент кодирования видео в шину событий"""
+    from proglog import ProgressBarLogger
+
+    class EncodeProgressLogger(ProgressBarLogger):
+        def __init__(self):
+            super().__init__()
+            self.last_percent = None
 
-def process_video(video_path):
-    """Обрабатывает видео перед публикацией"""
+        def bars_callback(self, bar, attr, value, old_value=None):
+            # 't' - кадры видео; звук кодируется отдельно и быстро
+            if bar != 't' or attr != 'index':
+                return
+            total = self.bars[bar].get('total')
+            if not total:
+                return
+            percent = min(int(value * 100 / total), 100)
+            if percent != self.last_percent:
+                self.last_percent = percent
+                progress_bus.emit(task_id, STAGE_ENCODE, percent)
+
+    return EncodeProgressLogger()
+
+def process_video(video_path, profile=None, task_id=None):
+    """
+    Обрабатывает видео перед публикацией
+
+    Args:
+        video_path: Путь к исходному видео
+        profile: Название профиля кодирования (по умолчанию VIDEO_ENCODING_PROFILE)
+        task_id: ID задачи, в шину событий которой отправляется ход обработки (опционально)
+
+    Видео, которое уже соответствует требованиям Reels, возвращается без
+    перекодирования. Результат обработки кешируется по хешу исходного файла
+    и параметрам обработки, поэтому повторная публикация того же видео не
+    кодирует его заново. Возвращаемый файл нельзя удалять после публикации:
+    файл из кеша закреплен, после публикации нужно вызвать video_cache.release.
+    """
     try:
-        # Создаем временный файл для обработанного видео
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-            processed_path = temp_file.name
-
-        # Загружаем видео
-        video = VideoFileClip(video_path)
-
-        # Проверяем соотношение сторон
-        width, height = video.size
-        aspect_ratio = width / height
-
-        # Для Reels рекомендуется соотношение 9:16
-        target_ratio = 9/16
-
-        # Если соотношение сторон не соответствует требуемому, обрезаем видео
-        if abs(aspect_ratio - target_ratio) > 0.1:
-            logger.info(f"Обрезаем видео с соотношением {aspect_ratio} до {target_ratio}")
-
-            if aspect_ratio > target_ratio:
-                # Видео слишком широкое, обрезаем по ширине
-                new_width = int(height * target_ratio)
-                x_center = width / 2
-                video = video.crop(x1=x_center - new_width/2, y1=0, x2=x_center + new_width/2, y2=height)
-            else:
-                # Видео слишком высокое, обрезаем по высоте
-                new_height = int(width / target_ratio)
-                y_center = height / 2
-                video = video.crop(x1=0, y1=y_center - new_height/2, x2=width, y2=y_center + new_height/2)
-
-        # Проверяем длительность
-        if video.duration > 90:
-            logger.info(f"Обрезаем видео с длительностью {video.duration} до 90 секунд")
-            video = video.subclip(0, 90)
-
-        # Сохраняем обработанное видео
-        video.write_videofile(processed_path, codec='libx264', audio_codec='aac')
-        video.close()
-
-        return processed_path, None
+        # Читаем метаданные без декодирования кадров: подходящее видео публикуем как есть
+        info = probe_video(video_path)
+        if is_reels_compliant(info, REELS_TARGET_RATIO, REELS_MAX_DURATION):
+            logger.info(f"Видео {video_path} уже соответствует требованиям Reels, перекодирование не требуется")
+            progress_bus.emit(task_id, STAGE_ENCODE, 100, "Видео уже соответствует требованиям Reels")
+            return video_path, None
+
+        encoding = get_encoding_profile(profile)
+
+        # Количество потоков не влияет на результат кодирования и не входит в ключ кеша
+        params = {
+            'target_ratio': REELS_TARGET_RATIO,
+            'max_duration': REELS_MAX_DURATION,
+            'codec': REELS_VIDEO_CODEC,
+            'audio_codec': REELS_AUDIO_CODEC,
+            'encoding': {key: value for key, value in encoding.items() if key not in ('name', 'threads')}
+        }
+        # Для файлов из хранилища медиа хеш содержимого уже известен из имени файла
+        cache_key = video_cache.make_key(video_path, params, source_hash=media_store.sha256_of(video_path))
+
+        # Одно и то же видео для нескольких аккаунтов кодируется только один раз
+        with video_cache.key_lock(cache_key):
+            cached_path = video_cache.get(cache_key, pin=True)
+            if cached_path:
+                logger.info(f"Используется обработанное видео из кеша: {cached_path}")
+                progress_bus.emit(task_id, STAGE_ENCODE, 100, "Используется ранее обработанное видео")
+                return cached_path, None
+
+            # Кодируем во временный файл в директории кеша, затем атомарно переносим
+            processed_path = video_cache.temp_path_for(cache_key)
+
+            # moviepy (вместе с numpy и imageio) загружается только при первом перекодировании
+            from moviepy.editor import VideoFileClip
+
+            # Загружаем видео
+            video = VideoFileClip(video_path)
+
+            # Проверяем соотношение сторон
+            width, height = video.size
+            aspect_ratio = width / height
+
+            # Для Reels рекомендуется соотношение 9:16
+            target_ratio = REELS_TARGET_RATIO
+
+            # Если соотношение сторон не соответствует требуемому, обрезаем видео
+            if abs(aspect_ratio - target_ratio) > 0.1:
+                logger.info(f"Обрезаем видео с соотношением {aspect_ratio} до {target_ratio}")
+
+                if aspect_ratio > target_ratio:
+                    # Видео слишком широкое, обрезаем по ширине
+                    new_width = int(height * target_ratio)
+                    x_center = width / 2
+                    video = video.crop(x1=x_center - new_width/2, y1=0, x2=x_center + new_width/2, y2=height)
+                else:
+                    # Видео слишком высокое, обрезаем по высоте
+                    new_height = int(width / target_ratio)
+                    y_center = height / 2
+                    video = video.crop(x1=0, y1=y_center - new_height/2, x2=width, y2=y_center + new_height/2)
+
+            # Проверяем длительность
+            if video.duration > REELS_MAX_DURATION:
+                logger.info(f"Обрезаем видео с длительностью {video.duration} до {REELS_MAX_DURATION} секунд")
+                video = video.subclip(0, REELS_MAX_DURATION)
+
+            # Сохраняем обработанное видео
+            ffmpeg_params = []
+            if encoding['crf'] is not None and not encoding['bitrate']:
+                ffmpeg_params = ['-crf', str(encoding['crf'])]
+
+            progress_bus.emit(task_id, STAGE_ENCODE, 0)
+
+            try:
+                started_at = time.monotonic()
+                video.write_videofile(
+                    processed_path,
+                    codec=REELS_VIDEO_CODEC,
+                    audio_codec=REELS_AUDIO_CODEC,
+                    preset=encoding['preset'],
+                    threads=encoding['threads'],
+                    bitrate=encoding['bitrate'],
+                    audio_bitrate=encoding['audio_bitrate'],
+                    audio_fps=encoding['audio_fps'],
+                    ffmpeg_params=ffmpeg_params,
+                    logger=_encode_progress_logger(task_id) if task_id is not None else 'bar'
+                )
+                elapsed = time.monotonic() - started_at
+                logger.info(
+                    f"Видео {video_path} закодировано за {elapsed:.1f} сек "
+                    f"(профиль {encoding['name']}, длительность {video.duration:.1f} сек, "
+                    f"скорость {video.duration / elapsed if elapsed else 0:.2f}x)"
+                )
+            except Exception:
+                # Не оставляем в кеше недописанный файл
+                if os.path.exists(processed_path):
+                    os.remove(processed_path)
+                raise
+            finally:
+                video.close()
+
+            return video_cache.put(cache_key, processed_path, pin=True), None
     except Exception as e:
         logger.error(f"Ошибка при обработке видео: {e}")
         return None, str(e)
@@ -106,40 +209,51 @@ def publish_video(task_id):
     update_publish_task_status(task_id, TaskStatus.PROCESSING)
 
     # Получаем клиент Instagram
-    client, error = get_instagram_client(task.account_id)
+    with client_pool.account_lock(task.account_id):
+        client, error = get_instagram_client(task.account_id)
     if error:
         update_publish_task_status(task_id, TaskStatus.FAILED, error)
+        progress_bus.emit(task_id, STAGE_ERROR, message=error)
         return False, error
 
+    processed_path = None
     try:
         # Обрабатываем видео
-        processed_path, error = process_video(task.media_path)
+        processed_path, error = process_video(task.media_path, task_id=task_id)
         if error:
             update_publish_task_status(task_id, TaskStatus.FAILED, error)
+            progress_bus.emit(task_id, STAGE_ERROR, message=error)
             return False, error
 
         # Публикуем видео как Reels
+        # (clip_upload загружает видео и настраивает публикацию одним вызовом,
+        # поэтому эти шаги отображаются как один этап)
+        progress_bus.emit(task_id, STAGE_UPLOAD)
+
         # Удаляем параметры mentions и locations, которые вызывают ошибку
-        result = client.clip_upload(
-            processed_path,
-            task.caption,
-            thumbnail=None,
-            configure_timeout=120
-        )
+        with client_pool.account_lock(task.account_id):
+            publish_rate_limiter.acquire(task.account_id)
+            result = client.clip_upload(
+                processed_path,
+                task.caption,
+                thumbnail=None,
+                configure_timeout=120
+            )
 
         # Обновляем статус задачи
+        # (обработанное видео остается в кеше для публикации в другие аккаунты)
         update_publish_task_status(task_id, TaskStatus.COMPLETED, media_id=result.id)
 
-        # Удаляем временные файлы
-        try:
-            os.remove(processed_path)
-        except:
-            pass
-
         logger.info(f"Видео успешно опубликовано, ID: {result.id}")
+        progress_bus.emit(task_id, STAGE_DONE)
         return True, result.id
     except Exception as e:
         error_message = str(e)
         logger.error(f"Ошибка при публикации видео: {error_message}")
         update_publish_task_status(task_id, TaskStatus.FAILED, error_message)
-        return False, error_message
\ No newline at end of file
+        progress_bus.emit(task_id, STAGE_ERROR, message=error_message)
+        return False, error_message
+    finally:
+        # Файл из кеша может быть удален при очистке только после публикации
+        if processed_path:
+            video_cache.release(processed_path)
\ No newline at end of file
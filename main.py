@@ -6,11 +6,13 @@ from telegram.ext import Updater
 # Импортируем наши модули
 from config import (
     TELEGRAM_TOKEN, LOG_LEVEL, LOG_FORMAT, LOG_FILE,
-    TELEGRAM_READ_TIMEOUT, TELEGRAM_CONNECT_TIMEOUT
+    TELEGRAM_READ_TIMEOUT, TELEGRAM_CONNECT_TIMEOUT, RUN_EMBEDDED_SCHEDULER
 )
 from database.db_manager import init_db
 from telegram_bot.bot import setup_bot
 from utils.scheduler import start_scheduler
+from utils.media_store import run_media_gc
+from instagram.client import run_session_stats_logger
 import sys
 print(f"Python version: {sys.version}")
 print(f"Python executable: {sys.executable}")
@@ -33,9 +35,21 @@ def main():
     init_db()
 
     # Запускаем планировщик задач в отдельном потоке
-    logger.info("Запуск планировщика задач...")
-    scheduler_thread = threading.Thread(target=start_scheduler, daemon=True)
-    scheduler_thread.start()
+    # (при работе с отдельными обработчиками worker.py его можно отключить)
+    if RUN_EMBEDDED_SCHEDULER:
+        logger.info("Запуск планировщика задач...")
+        scheduler_thread = threading.Thread(target=start_scheduler, daemon=True)
+        scheduler_thread.start()
+    else:
+        logger.info("Встроенный планировщик отключен, задачи выполняются процессами worker.py")
+
+    # Запускаем периодическую очистку неиспользуемых медиафайлов
+    gc_thread = threading.Thread(target=run_media_gc, daemon=True)
+    gc_thread.start()
+
+    # Периодически записываем в лог статистику проверок сессий Instagram
+    stats_thread = threading.Thread(target=run_session_stats_logger, daemon=True)
+    stats_thread.start()
 
     # Запускаем Telegram бота
     logger.info("Запуск Telegram бота...")
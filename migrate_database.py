@@ -18,9 +18,10 @@ sys.path.append(BASE_DIR)
 
 # Импортируем конфигурацию
 from config import DATABASE_URL
+from database.db_manager import create_db_engine
 
 # Создаем движок SQLAlchemy
-engine = create_engine(DATABASE_URL)
+engine = create_db_engine(DATABASE_URL)
 Session = sessionmaker(bind=engine)
 
 def upgrade_database():
@@ -50,6 +51,36 @@ def upgrade_database():
             logger.info("Добавление колонки 'last_login'")
             connection.execute('ALTER TABLE instagram_accounts ADD COLUMN last_login DATETIME')
         
+        # Колонки аренды задач на публикацию
+        task_columns = [col['name'] for col in inspector.get_columns('publish_tasks')]
+        
+        if 'lease_owner' not in task_columns:
+            logger.info("Добавление колонки 'lease_owner'")
+            connection.execute('ALTER TABLE publish_tasks ADD COLUMN lease_owner VARCHAR(255)')
+        
+        if 'lease_expires_at' not in task_columns:
+            logger.info("Добавление колонки 'lease_expires_at'")
+            connection.execute('ALTER TABLE publish_tasks ADD COLUMN lease_expires_at DATETIME')
+        
+        if 'progress' not in task_columns:
+            logger.info("Добавление колонки 'progress'")
+            connection.execute('ALTER TABLE publish_tasks ADD COLUMN progress INTEGER DEFAULT 0')
+        
+        if 'attempts' not in task_columns:
+            logger.info("Добавление колонки 'attempts'")
+            connection.execute('ALTER TABLE publish_tasks ADD COLUMN attempts INTEGER DEFAULT 0')
+        
+        # Индексы для частых выборок задач на публикацию
+        indexes = [index['name'] for index in inspector.get_indexes('publish_tasks')]
+        
+        if 'ix_publish_tasks_status_scheduled_time' not in indexes:
+            logger.info("Создание индекса 'ix_publish_tasks_status_scheduled_time'")
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_publish_tasks_status_scheduled_time ON publish_tasks (status, scheduled_time)')
+        
+        if 'ix_publish_tasks_account_id_status' not in indexes:
+            logger.info("Создание индекса 'ix_publish_tasks_account_id_status'")
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_publish_tasks_account_id_status ON publish_tasks (account_id, status)')
+        
         connection.close()
         logger.info("Миграция базы данных успешно завершена")
         return True
@@ -17,10 +17,12 @@ from telegram.keyboards import (
     get_tasks_menu_keyboard, get_proxy_menu_keyboard,
     get_accounts_list_keyboard
 )
-from utils.proxy_manager import distribute_proxies, check_proxy
+from utils.proxy_manager import distribute_proxies, check_proxy, check_all_proxies
 from instagram.profile_manager import ProfileManager
 from instagram.post_manager import PostManager
 from instagram.reels_manager import ReelsManager, publish_reels_in_parallel
+from telegram_bot.job_runner import job_runner
+from utils.media_store import media_store
 
 logger = logging.getLogger(__name__)
 
@@ -248,13 +250,8 @@ def profile_setup_handler(update: Update, context: CallbackContext):
             # Получаем файл с наилучшим качеством
             photo_file = update.message.photo[-1].get_file()
             
-            # Создаем директорию для аватаров, если её нет
-            avatar_dir = Path(MEDIA_DIR) / "avatars"
-            os.makedirs(avatar_dir, exist_ok=True)
-            
-            # Сохраняем файл
-            avatar_path = avatar_dir / f"avatar_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-            photo_file.download(avatar_path)
+            # Сохраняем файл в хранилище медиа
+            avatar_path = media_store.download_telegram_file(photo_file, suffix='.jpg')
             
             user_data_store[user_id]['avatar_path'] = str(avatar_path)
             
@@ -423,13 +420,8 @@ def publish_now_handler(update: Update, context: CallbackContext):
                 # Получаем файл с наилучшим качеством
                 photo_file = update.message.photo[-1].get_file()
                 
-                # Создаем директорию для фото, если её нет
-                photo_dir = Path(MEDIA_DIR) / "photos"
-                os.makedirs(photo_dir, exist_ok=True)
-                
-                # Сохраняем файл
-                photo_path = photo_dir / f"photo_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-                photo_file.download(photo_path)
+                # Сохраняем файл в хранилище медиа
+                photo_path = media_store.download_telegram_file(photo_file, suffix='.jpg')
                 
                 user_data_store[user_id]['media_path'] = str(photo_path)
                 
@@ -444,18 +436,13 @@ def publish_now_handler(update: Update, context: CallbackContext):
                 # Получаем файл
                 if update.message.video:
                     video_file = update.message.video.get_file()
-                    file_name = f"video_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+                    suffix = '.mp4'
                 else:
                     video_file = update.message.document.get_file()
-                    file_name = update.message.document.file_name
+                    suffix = os.path.splitext(update.message.document.file_name or '')[1] or '.mp4'
                 
-                # Создаем директорию для видео, если её нет
-                video_dir = Path(MEDIA_DIR) / "videos"
-                os.makedirs(video_dir, exist_ok=True)
-                
-                # Сохраняем файл
-                video_path = video_dir / file_name
-                video_file.download(video_path)
+                # Скачиваем файл в хранилище медиа (уже загруженное ранее видео повторно не скачивается)
+                video_path = media_store.download_telegram_file(video_file, suffix=suffix)
                 
                 user_data_store[user_id]['media_path'] = str(video_path)
                 
@@ -809,32 +796,38 @@ def callback_handler(update: Update, context: CallbackContext):
 
     # Кнопка проверки всех прокси
     elif data == "check_all_proxies":
-        query.edit_message_text(
-            "Начинаю проверку всех прокси. Это может занять некоторое время..."
-        )
+        # Проверка прокси выполняется в фоне, чтобы не блокировать обработку других сообщений
+        job_runner.submit(context.bot, query.message, "Проверка всех прокси", check_all_proxies_job, context.bot, user_id)
+
+    # Обработка других типов кнопок...
 
-        # Запускаем проверку прокси
-        results = check_all_proxies()
+    # Подтверждаем обработку callback
+    query.answer()
 
-        # Формируем отчет
-        report = "Результаты проверки прокси:\n\n"
+def check_all_proxies_job(status, bot, user_id):
+    """Фоновая проверка всех прокси с отправкой отчета пользователю"""
+    def report_progress(checked, total):
+        status.update(f"Проверка всех прокси (задача #{status.job_id})... {checked}/{total}")
 
-        for proxy_id, result in results.items():
-            proxy = next((p for p in get_proxies() if p.id == proxy_id), None)
-            if proxy:
-                status = "✅ Работает" if result['working'] else f"❌ Не работает: {result['error']}"
-                report += f"ID: {proxy.id}, {proxy.host}:{proxy.port} - {status}\n"
+    # Запускаем проверку прокси
+    results = check_all_proxies(progress_callback=report_progress)
+    proxies = {proxy.id: proxy for proxy in get_proxies()}
 
-        context.bot.send_message(
-            chat_id=user_id,
-            text=report,
-            reply_markup=get_proxy_menu_keyboard()
-        )
+    # Формируем отчет
+    report = "Результаты проверки прокси:\n\n"
 
-    # Обработка других типов кнопок...
+    for proxy_id, result in results.items():
+        proxy = proxies.get(proxy_id)
+        if proxy:
+            state = "✅ Работает" if result['working'] else f"❌ Не работает: {result['error']}"
+            report += f"ID: {proxy.id}, {proxy.host}:{proxy.port} - {state}\n"
 
-    # Подтверждаем обработку callback
-    query.answer()
+    status.finish(f"✅ Проверка прокси завершена (задача #{status.job_id})")
+    bot.send_message(
+        chat_id=user_id,
+        text=report,
+        reply_markup=get_proxy_menu_keyboard()
+    )
 
 def cancel_handler(update: Update, context: CallbackContext):
     """Обработчик для отмены текущей операции"""
@@ -1,14 +1,17 @@
-import json
 import os
 import time
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ParseMode
 from telegram.ext import ConversationHandler, CommandHandler, MessageHandler, Filters
 
-from config import ACCOUNTS_DIR, ADMIN_USER_IDS, MEDIA_DIR
-from database.db_manager import get_session, get_instagram_accounts, bulk_add_instagram_accounts, delete_instagram_account, get_instagram_account
+from config import ADMIN_USER_IDS, MEDIA_DIR, IMPORT_PROGRESS_INTERVAL
+from database.db_manager import get_session, get_instagram_accounts, delete_instagram_account, get_instagram_account
 from database.models import InstagramAccount
-from instagrapi import Client
-from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
+from instagram.client_pool import client_pool
+from instagram.session_store import session_store
+from utils.rate_limiter import RateLimitedClient
+from instagram.account_checker import check_accounts_validity, STATUS_VALID, STATUS_CHALLENGE
+from utils.account_import import import_accounts_file
+from telegram_bot.job_runner import job_runner
 
 # Состояния для добавления аккаунта
 ENTER_USERNAME, ENTER_PASSWORD, CONFIRM_ACCOUNT, ENTER_VERIFICATION_CODE = range(1, 5)
@@ -106,6 +109,10 @@ def enter_password(update, context):
     return CONFIRM_ACCOUNT
 
 def confirm_add_account(update, context):
+    # instagrapi нужен только при добавлении аккаунта, не загружаем его при запуске бота
+    from instagrapi import Client
+    from instagrapi.exceptions import LoginRequired, BadPassword, ChallengeRequired
+
     query = update.callback_query
     query.answer()
 
@@ -122,8 +129,8 @@ def confirm_add_account(update, context):
     query.edit_message_text("Проверка данных аккаунта Instagram... Это может занять некоторое время.")
 
     try:
-        # Создаем клиент Instagram
-        client = Client()
+        # Создаем клиент Instagram (запросы учитываются общим ограничителем частоты)
+        client = RateLimitedClient(Client(), username)
 
         try:
             # Пытаемся войти
@@ -142,19 +149,8 @@ def confirm_add_account(update, context):
             account_id = new_account.id
             session.close()
 
-            # Создаем директорию для аккаунта
-            account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-            os.makedirs(account_dir, exist_ok=True)
-
             # Сохраняем сессию
-            session_data = {
-                'username': username,
-                'account_id': account_id,
-                'created_at': str(new_account.created_at),
-                'settings': client.get_settings()
-            }
-            with open(os.path.join(account_dir, 'session.json'), 'w') as f:
-                json.dump(session_data, f)
+            session_store.save(account_id, client.get_settings(), username)
 
             keyboard = [[InlineKeyboardButton("🔙 К списку аккаунтов", callback_data='list_accounts')]]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -249,19 +245,8 @@ def enter_verification_code(update, context):
         account_id = new_account.id
         session.close()
 
-        # Создаем директорию для аккаунта
-        account_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-        os.makedirs(account_dir, exist_ok=True)
-
         # Сохраняем сессию
-        session_data = {
-            'username': username,
-            'account_id': account_id,
-            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'settings': client.get_settings()
-        }
-        with open(os.path.join(account_dir, 'session.json'), 'w') as f:
-            json.dump(session_data, f)
+        session_store.save(account_id, client.get_settings(), username)
 
         keyboard = [[InlineKeyboardButton("🔙 К списку аккаунтов", callback_data='list_accounts')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -425,12 +410,11 @@ def delete_account_handler(update, context):
     success, result = delete_instagram_account(account_id)
 
     if success:
-        # Удаляем файл сессии, если он существует
-        session_dir = os.path.join(ACCOUNTS_DIR, str(account_id))
-        session_file = os.path.join(session_dir, "session.json")
+        # Удаляем клиент аккаунта из пула
+        client_pool.evict(account_id)
 
-        if os.path.exists(session_file):
-            os.remove(session_file)
+        # Удаляем сохраненную сессию
+        session_store.delete(account_id)
 
         keyboard = [[InlineKeyboardButton("🔙 К списку аккаунтов", callback_data='list_accounts')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -483,12 +467,8 @@ def confirm_delete_all_accounts_handler(update, context):
 
     for account in accounts:
         try:
-            # Удаляем файл сессии, если он существует
-            session_dir = os.path.join(ACCOUNTS_DIR, str(account.id))
-            session_file = os.path.join(session_dir, "session.json")
-
-            if os.path.exists(session_file):
-                os.remove(session_file)
+            # Удаляем сохраненную сессию
+            session_store.delete(account.id)
 
             # Удаляем аккаунт из базы данных
             session.delete(account)
@@ -500,6 +480,8 @@ def confirm_delete_all_accounts_handler(update, context):
     session.commit()
     session.close()
 
+    client_pool.clear()
+
     # Формируем отчет
     if errors:
         report = f"✅ Удалено аккаунтов: {deleted_count}\n\n"
@@ -522,8 +504,6 @@ def check_accounts_validity_handler(update, context):
     query = update.callback_query
     query.answer()
 
-    query.edit_message_text("Проверка валидности аккаунтов... Это может занять некоторое время.")
-
     # Получаем все аккаунты
     accounts = get_instagram_accounts()
 
@@ -534,51 +514,20 @@ def check_accounts_validity_handler(update, context):
         )
         return
 
-    # Проверяем каждый аккаунт
-    results = []
-    for account in accounts:
-        try:
-            # Создаем клиент Instagram
-            client = Client()
-
-            try:
-                # Пытаемся войти
-                client.login(account.username, account.password)
-
-                results.append(f"✅ {account.username}: Аккаунт валиден")
-                # Обновляем статус аккаунта
-                session = get_session()
-                db_account = session.query(InstagramAccount).filter_by(id=account.id).first()
-                if db_account:
-                    db_account.is_active = True
-                    session.commit()
-                session.close()
-
-                # Выходим из аккаунта
-                client.logout()
-
-            except ChallengeRequired:
-                results.append(f"⚠️ {account.username}: Требуется подтверждение")
-                # Обновляем статус аккаунта
-                session = get_session()
-                db_account = session.query(InstagramAccount).filter_by(id=account.id).first()
-                if db_account:
-                    db_account.is_active = False
-                    session.commit()
-                session.close()
-
-            except (BadPassword, LoginRequired):
-                results.append(f"❌ {account.username}: Неверные учетные данные")
-                # Обновляем статус аккаунта
-                session = get_session()
-                db_account = session.query(InstagramAccount).filter_by(id=account.id).first()
-                if db_account:
-                    db_account.is_active = False
-                    session.commit()
-                session.close()
+    # Проверка может занять несколько минут, выполняем ее в фоне
+    job_runner.submit(context.bot, query.message, "Проверка валидности аккаунтов", check_accounts_validity_job, accounts)
 
-        except Exception as e:
-            results.append(f"❌ {account.username}: Ошибка при проверке - {str(e)}")
+def check_accounts_validity_job(status, accounts):
+    """Фоновая проверка валидности аккаунтов с отчетом в сообщении со статусом"""
+    def report_progress(checked, total):
+        status.update(f"Проверка валидности аккаунтов (задача #{status.job_id})... {checked}/{total}")
+
+    # Проверяем аккаунты параллельно и одной транзакцией обновляем их статус
+    icons = {STATUS_VALID: "✅", STATUS_CHALLENGE: "⚠️"}
+    results = [
+        f"{icons.get(result, '❌')} {account.username}: {message}"
+        for account, result, message in check_accounts_validity(accounts, progress_callback=report_progress)
+    ]
 
     # Формируем отчет
     report = "📊 *Результаты проверки валидности аккаунтов:*\n\n"
@@ -587,7 +536,7 @@ def check_accounts_validity_handler(update, context):
     keyboard = [[InlineKeyboardButton("🔙 К списку аккаунтов", callback_data='list_accounts')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    query.edit_message_text(
+    status.finish(
         report,
         reply_markup=reply_markup,
         parse_mode=ParseMode.MARKDOWN
@@ -632,55 +581,54 @@ def bulk_upload_accounts_file(update, context):
     file_path = os.path.join(MEDIA_DIR, f"accounts_{int(time.time())}.txt")
     new_file.download(file_path)
 
+    progress_message = update.message.reply_text("⏳ Импорт аккаунтов...")
+    last_progress_update = [time.time()]
+
+    def report_progress(report, bytes_read, total_bytes):
+        # Ограничиваем частоту редактирования сообщения
+        if time.time() - last_progress_update[0] < IMPORT_PROGRESS_INTERVAL:
+            return
+        last_progress_update[0] = time.time()
+
+        percent = int(bytes_read * 100 / total_bytes) if total_bytes else 100
+        try:
+            progress_message.edit_text(
+                f"⏳ Импорт аккаунтов: {percent}%\n\n"
+                f"✅ Добавлено: {report['added']}\n"
+                f"❌ Ошибок: {report['failed']}"
+            )
+        except Exception:
+            pass
+
     try:
-        # Парсим TXT файл
-        accounts_data = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('#'):  # Пропускаем пустые строки и комментарии
-                continue
-
-            parts = line.split(':', 1)  # Разделяем строку на username и password
-            if len(parts) != 2:
-                continue  # Пропускаем некорректные строки
-
-            username, password = parts
-            accounts_data.append({
-                "username": username.strip(),
-                "password": password.strip()
-            })
-
-        if not accounts_data:
-            update.message.reply_text("Не удалось найти аккаунты в файле. Проверьте формат файла.")
-            return ConversationHandler.END
+        # Читаем TXT файл построчно и добавляем аккаунты пачками
+        report_data = import_accounts_file(file_path, progress_callback=report_progress)
 
-        # Добавляем аккаунты
-        success, errors = bulk_add_instagram_accounts(accounts_data)
+        if not report_data['processed']:
+            progress_message.edit_text("Не удалось найти аккаунты в файле. Проверьте формат файла.")
+            return ConversationHandler.END
 
         # Формируем отчет
         report = f"📊 Результат загрузки аккаунтов:\n\n"
-        report += f"✅ Успешно добавлено: {len(success)}\n"
-        if success:
+        report += f"✅ Успешно добавлено: {report_data['added']}\n"
+        if report_data['added']:
             report += "Добавленные аккаунты:\n"
-            for username in success[:10]:  # Показываем только первые 10
+            for username in report_data['added_sample']:  # Показываем только первые 10
                 report += f"- {username}\n"
-            if len(success) > 10:
-                report += f"... и еще {len(success) - 10}\n"
+            if report_data['added'] > len(report_data['added_sample']):
+                report += f"... и еще {report_data['added'] - len(report_data['added_sample'])}\n"
 
-        if errors:
-            report += f"\n❌ Ошибки ({len(errors)}):\n"
-            for username, error in errors[:10]:  # Показываем только первые 10 ошибок
+        if report_data['failed']:
+            report += f"\n❌ Ошибки ({report_data['failed']}):\n"
+            for username, error in report_data['errors_sample']:  # Показываем только первые 10 ошибок
                 report += f"- {username}: {error}\n"
-            if len(errors) > 10:
-                report += f"... и еще {len(errors) - 10} ошибок\n"
+            if report_data['failed'] > len(report_data['errors_sample']):
+                report += f"... и еще {report_data['failed'] - len(report_data['errors_sample'])} ошибок\n"
 
         keyboard = [[InlineKeyboardButton("🔙 К списку аккаунтов", callback_data='list_accounts')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        update.message.reply_text(report, reply_markup=reply_markup)
+        progress_message.edit_text(report, reply_markup=reply_markup)
 
     except Exception as e:
         update.message.reply_text(f"Ошибка при обработке файла: {e}")
@@ -740,5 +688,6 @@ def get_account_handlers():
         CallbackQueryHandler(delete_account_handler, pattern='^delete_account_\d+$'),
         CallbackQueryHandler(delete_all_accounts_handler, pattern='^delete_all_accounts$'),
         CallbackQueryHandler(confirm_delete_all_accounts_handler, pattern='^confirm_delete_all_accounts$'),
+        # Проверка долгая, поэтому выполняется вне потока обработки обновлений
         CallbackQueryHandler(check_accounts_validity_handler, pattern='^check_accounts_validity$')
     ]
\ No newline at end of file
@@ -1,11 +1,17 @@
 import logging
+   import os
+   import time
    from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
    from telegram.ext import CallbackContext, ConversationHandler
 
-   from config import ADMIN_USER_IDS
-   from database.db_manager import add_instagram_account
+   from config import ADMIN_USER_IDS, ACCOUNTS_IMPORT_CHUNK_SIZE, IMPORT_PROGRESS_INTERVAL
+   from database.db_manager import bulk_add_instagram_accounts
+   from instagram.session_store import serialize_session
+   from utils.rate_limiter import RateLimitedClient
    from telegram.keyboards import get_accounts_menu_keyboard
-   from instagram.client import Client
+   from utils.account_import import (
+       iter_cookie_files, new_import_report, add_to_report, REPORT_SAMPLE_SIZE
+   )
 
    logger = logging.getLogger(__name__)
 
@@ -49,6 +55,8 @@ import logging
 
    def handle_cookies_file(update: Update, context: CallbackContext):
        """Обработчик для файла с куки"""
+       from instagrapi import Client
+
        user_id = update.effective_user.id
 
        # Проверяем, что пользователь отправил файл
@@ -69,125 +77,83 @@ import logging
        file_path = os.path.join(temp_dir, file_name)
        file.download(file_path)
 
-       # Обрабатываем файл в зависимости от его типа
-       if file_name.endswith('.json'):
-           # Обрабатываем JSON-файл
-           try:
-               with open(file_path, 'r') as f:
-                   cookies_data = json.load(f)
-
-               results = []
-
-               for username, settings in cookies_data.items():
-                   # Сохраняем сессию
-                   session_dir = os.path.join(os.path.dirname(__file__), "sessions")
-                   os.makedirs(session_dir, exist_ok=True)
-                   session_file = os.path.join(session_dir, f"{username}.json")
-
-                   with open(session_file, 'w') as f:
-                       json.dump(settings, f)
-
-                   # Проверяем, работает ли сессия
-                   client = Client()
-                   client.set_settings(settings)
+       if not (file_name.endswith('.json') or file_name.endswith('.zip')):
+           update.message.reply_text(
+               "Неподдерживаемый формат файла. Пожалуйста, отправьте JSON-файл или ZIP-архив.",
+               reply_markup=get_accounts_menu_keyboard()
+           )
+           return WAITING_COOKIES_FILE
 
+       progress_message = update.message.reply_text("⏳ Загрузка аккаунтов по куки...")
+       last_progress_update = time.time()
+
+       # Элементы архива читаются по одному, аккаунты добавляются в базу пачками
+       report = new_import_report()
+       session_errors = []
+       valid_accounts = []
+
+       def flush_valid_accounts():
+           if valid_accounts:
+               success, errors = bulk_add_instagram_accounts(valid_accounts)
+               add_to_report(report, success, errors)
+               valid_accounts.clear()
+
+       try:
+           for username, settings, error in iter_cookie_files(file_path):
+               if error:
+                   session_errors.append(f"❌ {username}: Ошибка при обработке файла - {error}")
+                   continue
+
+               # Проверяем, работает ли сессия (запросы учитываются общим ограничителем частоты)
+               client = RateLimitedClient(Client(), username)
+               client.set_settings(settings)
+
+               try:
+                   client.get_timeline_feed()  # Проверка, что сессия активна
+
+                   # Добавляем аккаунт в базу данных (без пароля) вместе с сессией
+                   valid_accounts.append({
+                       "username": username,
+                       "password": "",
+                       "session_data": serialize_session(username, settings)
+                   })
+                   if len(valid_accounts) >= ACCOUNTS_IMPORT_CHUNK_SIZE:
+                       flush_valid_accounts()
+
+               except Exception as e:
+                   session_errors.append(f"❌ {username}: Ошибка при проверке сессии - {e}")
+
+               # Сообщаем о прогрессе не чаще IMPORT_PROGRESS_INTERVAL
+               if time.time() - last_progress_update >= IMPORT_PROGRESS_INTERVAL:
+                   last_progress_update = time.time()
                    try:
-                       client.get_timeline_feed()  # Проверка, что сессия активна
-
-                       # Добавляем аккаунт в базу данных (без пароля)
-                       success, result = add_instagram_account(username, "")
-
-                       if success:
-                           results.append(f"✅ {username}: Успешно добавлен")
-                       else:
-                           results.append(f"❌ {username}: Ошибка при добавлении в БД - {result}")
-
-                   except Exception as e:
-                       results.append(f"❌ {username}: Ошибка при проверке сессии - {e}")
-
-               # Отправляем результаты
-               update.message.reply_text(
-                   "Результаты загрузки аккаунтов по куки:\n\n" + "\n".join(results),
-                   reply_markup=get_accounts_menu_keyboard()
-               )
-
-           except Exception as e:
-               update.message.reply_text(
-                   f"Ошибка при обработке JSON-файла: {e}",
-                   reply_markup=get_accounts_menu_keyboard()
-               )
-
-       elif file_name.endswith('.zip'):
-           # Обрабатываем ZIP-архив
-           import zipfile
-
-           try:
-               # Создаем директорию для распаковки
-               extract_dir = os.path.join(temp_dir, "extract")
-               os.makedirs(extract_dir, exist_ok=True)
-
-               # Распаковываем архив
-               with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                   zip_ref.extractall(extract_dir)
-
-               # Обрабатываем каждый JSON-файл
-               results = []
-
-               for json_file in os.listdir(extract_dir):
-                   if json_file.endswith('.json'):
-                       username = os.path.splitext(json_file)[0]
-
-                       try:
-                           with open(os.path.join(extract_dir, json_file), 'r') as f:
-                               settings = json.load(f)
-
-                           # Сохраняем сессию
-                           session_dir = os.path.join(os.path.dirname(__file__), "sessions")
-                           os.makedirs(session_dir, exist_ok=True)
-                           session_file = os.path.join(session_dir, f"{username}.json")
-
-                           with open(session_file, 'w') as f:
-                               json.dump(settings, f)
-
-                           # Проверяем, работает ли сессия
-                           client = Client()
-                           client.set_settings(settings)
-
-                           try:
-                               client.get_timeline_feed()  # Проверка, что сессия активна
-
-                               # Добавляем аккаунт в базу данных (без пароля)
-                               success, result = add_instagram_account(username, "")
-
-                               if success:
-                                   results.append(f"✅ {username}: Успешно добавлен")
-                               else:
-                                   results.append(f"❌ {username}: Ошибка при добавлении в БД - {result}")
-
-                           except Exception as e:
-                               results.append(f"❌ {username}: Ошибка при проверке сессии - {e}")
-
-                       except Exception as e:
-                           results.append(f"❌ {username}: Ошибка при обработке файла - {e}")
-
-               # Отправляем результаты
-               update.message.reply_text(
-                   "Результаты загрузки аккаунтов по куки:\n\n" + "\n".join(results),
-                   reply_markup=get_accounts_menu_keyboard()
-               )
-
-           except Exception as e:
-               update.message.reply_text(
-                   f"Ошибка при обработке ZIP-архива: {e}",
-                   reply_markup=get_accounts_menu_keyboard()
-               )
+                       progress_message.edit_text(
+                           f"⏳ Загрузка аккаунтов по куки...\n\n"
+                           f"✅ Добавлено: {report['added']}\n"
+                           f"❌ Ошибок: {report['failed'] + len(session_errors)}"
+                       )
+                   except Exception:
+                       pass
+
+           flush_valid_accounts()
+
+           # Отправляем результаты
+           results = [f"✅ {username}: Успешно добавлен" for username in report['added_sample']]
+           results += [f"❌ {username}: Ошибка при добавлении в БД - {error}" for username, error in report['errors_sample']]
+           results += session_errors[:REPORT_SAMPLE_SIZE]
+
+           progress_message.edit_text(
+               "Результаты загрузки аккаунтов по куки:\n\n"
+               f"✅ Добавлено: {report['added']}\n"
+               f"❌ Ошибок: {report['failed'] + len(session_errors)}\n\n" + "\n".join(results),
+               reply_markup=get_accounts_menu_keyboard()
+           )
 
-       else:
+       except Exception as e:
            update.message.reply_text(
-               "Неподдерживаемый формат файла. Пожалуйста, отправьте JSON-файл или ZIP-архив.",
+               f"Ошибка при обработке файла с куки: {e}",
                reply_markup=get_accounts_menu_keyboard()
            )
-           return WAITING_COOKIES_FILE
 
        # Удаляем временные файлы
        import shutil
@@ -1,5 +1,4 @@
 import os
-import tempfile
 from datetime import datetime
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ParseMode
@@ -7,6 +6,8 @@ from telegram.ext import ConversationHandler
 
 from database.db_manager import get_instagram_account, get_instagram_accounts, create_publish_task
 from instagram_api.publisher import publish_video
+from telegram_bot.job_runner import job_runner
+from utils.media_store import media_store
 
 # Состояния для публикации видео
 CHOOSE_ACCOUNT, ENTER_CAPTION, CONFIRM_PUBLISH, CHOOSE_SCHEDULE = range(10, 14)
@@ -110,15 +111,9 @@ def video_upload_handler(update, context):
     video_file = update.message.video or update.message.document
     file_id = video_file.file_id
 
-    # Скачиваем видео
+    # Скачиваем видео в хранилище медиа (уже загруженное ранее видео повторно не скачивается)
     video = context.bot.get_file(file_id)
-
-    # Создаем временный файл для сохранения видео
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-        video_path = temp_file.name
-
-    # Скачиваем видео во временный файл
-    video.download(video_path)
+    video_path = media_store.download_telegram_file(video, suffix=os.path.splitext(video.file_path or '')[1] or '.mp4')
 
     # Сохраняем путь к видео
     context.user_data['publish_media_path'] = video_path
@@ -178,42 +173,22 @@ def confirm_publish_now(update, context):
     media_type = context.user_data.get('publish_media_type')
     caption = context.user_data.get('publish_caption', '')
 
-    query.edit_message_text("⏳ Публикация контента... Это может занять некоторое время.")
-
-    # Создаем задачу на публикацию
-    success, task_id = create_publish_task(
-        account_id=account_id,
-        task_type=media_type,
-        media_path=media_path,
-        caption=caption
-    )
-
-    if not success:
-        query.edit_message_text(f"❌ Ошибка при создании задачи: {task_id}")
-        return ConversationHandler.END
-
-    # Публикуем видео
-    if media_type == 'video':
-        success, result = publish_video(task_id)
-
-        if success:
-            keyboard = [[InlineKeyboardButton("🔙 К меню задач", callback_data='menu_tasks')]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+    if media_type != 'video':
+        query.edit_message_text("❌ Неподдерживаемый тип медиа")
+    else:
+        # Создаем задачу на публикацию
+        success, task_id = create_publish_task(
+            account_id=account_id,
+            task_type=media_type,
+            media_path=media_path,
+            caption=caption
+        )
 
-            query.edit_message_text(
-                "✅ Видео успешно опубликовано!",
-                reply_markup=reply_markup
-            )
+        if not success:
+            query.edit_message_text(f"❌ Ошибка при создании задачи: {task_id}")
         else:
-            keyboard = [[InlineKeyboardButton("🔙 К меню задач", callback_data='menu_tasks')]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            query.edit_message_text(
-                f"❌ Ошибка при публикации видео: {result}",
-                reply_markup=reply_markup
-            )
-    else:
-        query.edit_message_text("❌ Неподдерживаемый тип медиа")
+            # Публикуем в фоне, чтобы не блокировать обработку других сообщений
+            job_runner.submit(context.bot, query.message, "Публикация видео", publish_now_job, task_id)
 
     # Очищаем данные
     if 'publish_account_id' in context.user_data:
@@ -229,6 +204,20 @@ def confirm_publish_now(update, context):
 
     return ConversationHandler.END
 
+def publish_now_job(status, task_id):
+    """Фоновая публикация видео с отчетом в сообщении со статусом"""
+    # Этапы обработки и загрузки видео отображаются в сообщении со статусом
+    with status.track(task_id, "⏳ Публикация видео"):
+        success, result = publish_video(task_id)
+
+    keyboard = [[InlineKeyboardButton("🔙 К меню задач", callback_data='menu_tasks')]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+
+    if success:
+        status.finish("✅ Видео успешно опубликовано!", reply_markup=reply_markup)
+    else:
+        status.finish(f"❌ Ошибка при публикации видео: {result}", reply_markup=reply_markup)
+
 def schedule_publish_callback(update, context):
     """Обработчик запланированной публикации"""
     query = update.callback_query
@@ -306,11 +295,7 @@ def cancel_publish(update, context):
     if 'publish_account_username' in context.user_data:
         del context.user_data['publish_account_username']
     if 'publish_media_path' in context.user_data:
-        # Удаляем временный файл
-        try:
-            os.remove(context.user_data['publish_media_path'])
-        except:
-            pass
+        # Файл в хранилище медиа может использоваться другими задачами, поэтому не удаляем его
         del context.user_data['publish_media_path']
     if 'publish_media_type' in context.user_data:
         del context.user_data['publish_media_type']
@@ -0,0 +1,203 @@
+import itertools
+import logging
+import threading
+import time
+import concurrent.futures
+from contextlib import contextmanager
+
+from config import TELEGRAM_JOB_WORKERS, TELEGRAM_PROGRESS_INTERVAL
+from utils.progress import progress_bus, format_event
+
+logger = logging.getLogger(__name__)
+
+class ChatEditLimiter:
+    """Распределяет редактирования сообщений так, чтобы в одном чате было не больше одного за min_interval секунд"""
+
+    def __init__(self, min_interval=TELEGRAM_PROGRESS_INTERVAL):
+        self.min_interval = min_interval
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, chat_id):
+        """
+        Резервирует ближайшее свободное время для редактирования в чате.
+
+        Returns:
+            float: Сколько секунд нужно подождать до редактирования
+        """
+        with self._lock:
+            now = time.monotonic()
+            allowed_at = max(now, self._next_allowed.get(chat_id, now))
+            self._next_allowed[chat_id] = allowed_at + self.min_interval
+        return allowed_at - now
+
+# Общий ограничитель редактирований для всех сообщений со статусом
+chat_edit_limiter = ChatEditLimiter()
+
+class JobStatusMessage:
+    """
+    Сообщение Telegram, в котором отображается состояние фоновой операции.
+
+    Промежуточные обновления объединяются: в каждом чате сообщения
+    редактируются не чаще одного раза за TELEGRAM_PROGRESS_INTERVAL секунд,
+    и отправляется только последнее состояние. Так при массовой публикации
+    не превышаются ограничения Telegram на редактирование сообщений.
+    """
+
+    def __init__(self, bot, chat_id, message_id, job_id, limiter=None):
+        """
+        Args:
+            bot: Бот Telegram
+            chat_id (int): ID чата
+            message_id (int): ID редактируемого сообщения
+            job_id (int): ID фоновой операции
+            limiter (ChatEditLimiter): Ограничитель редактирований (по умолчанию общий)
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.job_id = job_id
+        self.limiter = limiter or chat_edit_limiter
+        self._pending = None
+        self._timer = None
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def _edit(self, text, **kwargs):
+        try:
+            self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
+        except Exception as e:
+            # Например, "message is not modified" - на результат операции не влияет
+            logger.debug(f"Не удалось обновить сообщение задачи #{self.job_id}: {e}")
+
+    def update(self, text, force=False):
+        """
+        Обновляет промежуточное состояние операции.
+
+        Если редактировать сообщение пока нельзя, текст будет отправлен
+        позже; более новые обновления заменяют еще не отправленные.
+
+        Args:
+            text (str): Текст сообщения
+            force (bool): Обновить сообщение без учета интервала
+
+        Returns:
+            bool: True, если сообщение было отправлено сразу
+        """
+        with self._lock:
+            if self._finished:
+                return False
+            self._pending = text
+            if self._timer is not None:
+                # Отправка уже запланирована, будет отправлен последний текст
+                return False
+
+            delay = self.limiter.reserve(self.chat_id)
+            if delay > 0 and not force:
+                self._timer = threading.Timer(delay, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+                return False
+
+        self._flush()
+        return True
+
+    def _flush(self):
+        with self._lock:
+            text, self._pending = self._pending, None
+            self._timer = None
+            if text is None or self._finished:
+                return
+        self._edit(text)
+
+    def finish(self, text, reply_markup=None, parse_mode=None):
+        """Показывает итоговый результат операции"""
+        with self._lock:
+            self._finished = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._edit(text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+    @contextmanager
+    def track(self, task_id, title):
+        """
+        Отображает события задачи на публикацию из шины событий, пока выполняется блок with.
+
+        Args:
+            task_id (int): ID задачи на публикацию
+            title (str): Заголовок сообщения
+        """
+        def on_event(event):
+            self.update(f"{title} (задача #{self.job_id})\n{format_event(event)}")
+
+        progress_bus.subscribe(task_id, on_event)
+        try:
+            yield self
+        finally:
+            progress_bus.unsubscribe(task_id, on_event)
+
+class JobRunner:
+    """
+    Выполняет долгие операции бота (публикация, проверки) в отдельных потоках.
+
+    Обработчик сразу возвращает управление диспетчеру, а операция сама
+    сообщает о ходе выполнения, редактируя сообщение со статусом.
+    """
+
+    def __init__(self, max_workers=TELEGRAM_JOB_WORKERS):
+        """
+        Args:
+            max_workers (int): Количество одновременно выполняемых операций
+        """
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bot-job")
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, bot, message, title, func, *args, **kwargs):
+        """
+        Запускает операцию в фоне.
+
+        Операция вызывается как func(status, *args, **kwargs), где status -
+        JobStatusMessage для промежуточных обновлений и итогового результата.
+
+        Args:
+            bot: Бот Telegram
+            message (Message): Сообщение, в котором отображается статус операции
+            title (str): Название операции для пользователя
+            func (callable): Выполняемая функция
+
+        Returns:
+            int: ID операции
+        """
+        job_id = next(self._ids)
+        status = JobStatusMessage(bot, message.chat_id, message.message_id, job_id)
+        status.update(f"⏳ {title} (задача #{job_id})... Это может занять некоторое время.", force=True)
+
+        with self._lock:
+            self._jobs[job_id] = {'title': title, 'started_at': time.time()}
+
+        self._executor.submit(self._run, job_id, title, status, func, args, kwargs)
+        logger.info(f"Запущена фоновая задача #{job_id}: {title}")
+        return job_id
+
+    def _run(self, job_id, title, status, func, args, kwargs):
+        try:
+            func(status, *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Ошибка в фоновой задаче #{job_id} ({title}): {e}")
+            status.finish(f"❌ {title}: ошибка - {e}")
+        finally:
+            with self._lock:
+                job = self._jobs.pop(job_id, None)
+            if job:
+                logger.info(f"Фоновая задача #{job_id} завершена за {time.time() - job['started_at']:.1f} сек")
+
+    def active_jobs(self):
+        """Возвращает выполняющиеся операции {job_id: {'title', 'started_at'}}"""
+        with self._lock:
+            return dict(self._jobs)
+
+# Общий исполнитель фоновых операций бота
+job_runner = JobRunner()
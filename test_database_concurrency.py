@@ -0,0 +1,85 @@
+"""
+Тест одновременной записи в базу данных SQLite из нескольких потоков
+"""
+try:
+    import os
+    import tempfile
+    import threading
+    from datetime import datetime
+
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+
+    from database.db_manager import create_db_engine
+    from database.models import Base, InstagramAccount, PublishTask, TaskStatus
+
+    THREADS = 8
+    WRITES_PER_THREAD = 50
+
+    # Создаем временную базу данных
+    temp_dir = tempfile.mkdtemp()
+    engine = create_db_engine(f"sqlite:///{os.path.join(temp_dir, 'test.sqlite')}")
+    Session = sessionmaker(bind=engine)
+    Base.metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+        synchronous = connection.execute(text("PRAGMA synchronous")).scalar()
+        busy_timeout = connection.execute(text("PRAGMA busy_timeout")).scalar()
+    print(f"journal_mode={journal_mode}, synchronous={synchronous}, busy_timeout={busy_timeout}")
+
+    session = Session()
+    account = InstagramAccount(username="concurrency_test", password="test")
+    session.add(account)
+    session.commit()
+    account_id = account.id
+    session.close()
+
+    errors = []
+
+    def writer(thread_index):
+        for i in range(WRITES_PER_THREAD):
+            session = Session()
+            try:
+                # Создание задачи и обновление ее статуса, как это делают планировщик и менеджеры
+                task = PublishTask(
+                    account_id=account_id,
+                    task_type='reel',
+                    media_path=f"/tmp/{thread_index}_{i}.mp4",
+                    status=TaskStatus.PENDING,
+                    scheduled_time=datetime.now()
+                )
+                session.add(task)
+                session.commit()
+
+                task.status = TaskStatus.COMPLETED
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                errors.append(str(e))
+            finally:
+                session.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    session = Session()
+    completed = session.query(PublishTask).filter_by(status=TaskStatus.COMPLETED).count()
+    session.close()
+
+    expected = THREADS * WRITES_PER_THREAD
+    if errors:
+        print(f"Ошибки при одновременной записи ({len(errors)}): {errors[0]}")
+    elif completed != expected:
+        print(f"Записано {completed} задач вместо {expected}!")
+    else:
+        print(f"Одновременная запись работает корректно: {completed} задач из {THREADS} потоков.")
+
+    engine.dispose()
+except ImportError as e:
+    print(f"Ошибка импорта: {e}")
+except Exception as e:
+    print(f"Ошибка при тестировании одновременной записи: {e}")
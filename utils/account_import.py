@@ -0,0 +1,130 @@
+import os
+import json
+import logging
+import zipfile
+
+from config import ACCOUNTS_IMPORT_CHUNK_SIZE
+from database.db_manager import bulk_add_instagram_accounts
+
+logger = logging.getLogger(__name__)
+
+# Сколько добавленных аккаунтов и ошибок сохранять для отчета
+REPORT_SAMPLE_SIZE = 10
+
+def chunked(iterable, size):
+    """Разбивает последовательность на списки по size элементов, не читая ее целиком"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parse_account_line(line):
+    """
+    Разбирает строку файла аккаунтов формата username:password
+
+    Returns:
+        dict: Данные аккаунта или None для пустых, закомментированных и некорректных строк
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):  # Пропускаем пустые строки и комментарии
+        return None
+
+    parts = line.split(':', 1)  # Разделяем строку на username и password
+    if len(parts) != 2:
+        return None  # Пропускаем некорректные строки
+
+    username, password = parts
+    return {
+        "username": username.strip(),
+        "password": password.strip()
+    }
+
+def new_import_report():
+    """Создает пустой отчет об импорте"""
+    return {
+        'processed': 0,
+        'added': 0,
+        'failed': 0,
+        'added_sample': [],
+        'errors_sample': []
+    }
+
+def add_to_report(report, success, errors):
+    """Добавляет результат bulk_add_instagram_accounts в отчет, сохраняя только первые записи"""
+    report['processed'] += len(success) + len(errors)
+    report['added'] += len(success)
+    report['failed'] += len(errors)
+    report['added_sample'].extend(success[:REPORT_SAMPLE_SIZE - len(report['added_sample'])])
+    report['errors_sample'].extend(errors[:REPORT_SAMPLE_SIZE - len(report['errors_sample'])])
+
+def import_accounts_file(file_path, chunk_size=ACCOUNTS_IMPORT_CHUNK_SIZE, progress_callback=None):
+    """
+    Построчно импортирует аккаунты из TXT файла, добавляя их пачками.
+
+    Файл не загружается в память целиком, поэтому размер файла не ограничен.
+
+    Args:
+        file_path (str): Путь к файлу формата username:password
+        chunk_size (int): Количество аккаунтов в одной пачке
+        progress_callback (callable): Функция progress_callback(report, bytes_read, total_bytes),
+            вызываемая после каждой пачки (опционально)
+
+    Returns:
+        dict: Отчет об импорте (см. new_import_report)
+    """
+    report = new_import_report()
+    total_bytes = os.path.getsize(file_path)
+    position = {'bytes_read': 0}
+
+    def iter_accounts(f):
+        for raw_line in f:
+            position['bytes_read'] += len(raw_line)
+            account = parse_account_line(raw_line.decode('utf-8', errors='replace'))
+            if account:
+                yield account
+
+    with open(file_path, 'rb') as f:
+        for chunk in chunked(iter_accounts(f), chunk_size):
+            success, errors = bulk_add_instagram_accounts(chunk)
+            add_to_report(report, success, errors)
+
+            if progress_callback:
+                progress_callback(report, position['bytes_read'], total_bytes)
+
+    logger.info(f"Импорт аккаунтов из {file_path}: добавлено {report['added']}, ошибок {report['failed']}")
+    return report
+
+def iter_cookie_files(file_path):
+    """
+    Лениво перебирает настройки сессий из JSON-файла или ZIP-архива.
+
+    Элементы ZIP-архива читаются по одному без распаковки на диск.
+
+    Args:
+        file_path (str): Путь к JSON-файлу {username: settings} или ZIP-архиву с файлами username.json
+
+    Yields:
+        tuple: (username, settings или None, ошибка или None)
+    """
+    if file_path.endswith('.zip'):
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                if member.is_dir() or not member.filename.endswith('.json'):
+                    continue
+
+                username = os.path.splitext(os.path.basename(member.filename))[0]
+                try:
+                    with zip_ref.open(member) as f:
+                        yield username, json.load(f), None
+                except Exception as e:
+                    yield username, None, str(e)
+    else:
+        with open(file_path, 'r') as f:
+            cookies_data = json.load(f)
+
+        for username, settings in cookies_data.items():
+            yield username, settings, None
@@ -0,0 +1,145 @@
+import os
+import uuid
+import logging
+import multiprocessing
+import threading
+import concurrent.futures
+
+from PIL import Image
+
+from config import IMAGE_PREP_DIR, IMAGE_PREP_WORKERS
+from utils.image_splitter import (
+    encode_image, find_first_fitting, load_normalized_image, split_image, OPTIMIZE_QUALITIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Расширения файлов для форматов изображений
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+# Параметры подготовки изображения по умолчанию
+DEFAULT_SPEC = {
+    'max_size': None,      # (ширина, высота): уменьшить с сохранением пропорций
+    'format': 'JPEG',      # Формат результата
+    'quality': 95,         # Качество сжатия
+    'max_size_kb': None,   # Максимальный размер файла: качество подбирается не выше quality
+    'grid': None,          # (ряды, колонки): разрезать на части (например, для мозаики)
+    'optimize': False      # Дополнительная оптимизация при сохранении (медленнее)
+}
+
+# Изображения Instagram: не больше 1080x1350, JPEG
+INSTAGRAM_PHOTO_SPEC = {'max_size': (1080, 1350), 'format': 'JPEG', 'quality': 95, 'optimize': True}
+
+def image_spec(**params):
+    """
+    Создает параметры подготовки изображения (см. DEFAULT_SPEC)
+
+    Returns:
+        dict: Параметры с подставленными значениями по умолчанию
+    """
+    unknown = set(params) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры подготовки изображения: {', '.join(sorted(unknown))}")
+    return dict(DEFAULT_SPEC, **params)
+
+def _encode(img, spec):
+    """Кодирует изображение по параметрам spec и возвращает его содержимое"""
+    if spec['max_size_kb']:
+        qualities = [quality for quality in OPTIMIZE_QUALITIES if quality <= spec['quality']] or [spec['quality']]
+        _, data = find_first_fitting(
+            qualities,
+            lambda quality: encode_image(img, spec['format'], quality, optimize=spec['optimize']),
+            spec['max_size_kb'] * 1024
+        )
+        if data is not None:
+            return data
+        # Лимит недостижим: используем минимальное качество
+        return encode_image(img, spec['format'], qualities[-1], optimize=spec['optimize'])
+
+    return encode_image(img, spec['format'], spec['quality'], optimize=spec['optimize'])
+
+def prepare_image(source_path, spec, output_dir=IMAGE_PREP_DIR):
+    """
+    Подготавливает одно изображение (выполняется в процессе пула)
+
+    Args:
+        source_path (str): Путь к исходному изображению
+        spec (dict): Параметры подготовки (см. image_spec)
+        output_dir (str): Директория для результатов
+
+    Returns:
+        list: Пути к результатам (несколько - при разрезании на части, по рядам слева направо)
+    """
+    spec = dict(DEFAULT_SPEC, **spec)
+
+    # Поворот из EXIF и цветовой режим применяются один раз при загрузке
+    img = load_normalized_image(source_path, mode='RGB' if spec['format'] == 'JPEG' else None)
+
+    if spec['max_size']:
+        img.thumbnail(spec['max_size'], Image.LANCZOS)
+
+    tiles = split_image(img, *spec['grid']) if spec['grid'] else [img]
+
+    os.makedirs(output_dir, exist_ok=True)
+    batch_id = uuid.uuid4().hex[:12]
+    extension = FORMAT_EXTENSIONS.get(spec['format'], f".{spec['format'].lower()}")
+
+    output_paths = []
+    for index, tile in enumerate(tiles):
+        output_path = os.path.join(str(output_dir), f"{batch_id}_{index}{extension}")
+        with open(output_path, 'wb') as f:
+            f.write(_encode(tile, spec))
+        output_paths.append(output_path)
+
+    return output_paths
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Возвращает общий пул процессов подготовки изображений (создается при первом использовании)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: бот и обработчики многопоточные, fork таких процессов может зависнуть на блокировках
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=IMAGE_PREP_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def prepare_images(jobs, output_dir=IMAGE_PREP_DIR):
+    """
+    Подготавливает пачку изображений параллельно в пуле процессов.
+
+    Args:
+        jobs (list): Задания (путь к исходному изображению, параметры image_spec)
+        output_dir (str): Директория для результатов
+
+    Returns:
+        list: Для каждого задания в исходном порядке - (успех, список путей к результатам или ошибка)
+    """
+    if not jobs:
+        return []
+
+    pool = _get_pool()
+    futures = [pool.submit(prepare_image, source_path, spec, output_dir) for source_path, spec in jobs]
+
+    results = []
+    for (source_path, _), future in zip(jobs, futures):
+        try:
+            results.append((True, future.result()))
+        except Exception as e:
+            logger.error(f"Ошибка при подготовке изображения {source_path}: {e}")
+            results.append((False, str(e)))
+
+    logger.info(f"Подготовлено изображений: {sum(1 for success, _ in results if success)} из {len(jobs)}")
+    return results
+
+def shutdown_pool():
+    """Останавливает пул процессов подготовки изображений"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -1,6 +1,8 @@
 import logging
 import os
-from PIL import Image
+import concurrent.futures
+from io import BytesIO
+from PIL import Image, ImageOps
 import uuid
 from pathlib import Path
 
@@ -8,21 +10,77 @@ from config import MEDIA_DIR
 
 logger = logging.getLogger(__name__)
 
+# Качество JPEG частей мозаики
+MOSAIC_QUALITY = 95
+
+def load_normalized_image(image_path, mode='RGB'):
+    """
+    Декодирует изображение один раз и приводит его к виду, пригодному для публикации
+
+    Поворот из EXIF применяется к пикселям, цветовой режим приводится к mode,
+    поэтому дальнейшая обработка не требует повторных преобразований.
+
+    Args:
+        image_path: Путь к изображению
+        mode: Требуемый цветовой режим (None - оставить исходный)
+
+    Returns:
+        Image: Загруженное изображение
+    """
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.load()
+
+    if mode and img.mode != mode:
+        img = img.convert(mode)
+    return img
+
+def split_image(img, rows, cols):
+    """
+    Разрезает изображение на rows x cols частей
+
+    Returns:
+        list: Части изображения по рядам слева направо
+    """
+    width, height = img.size
+    part_width, part_height = width // cols, height // rows
+
+    return [
+        img.crop((col * part_width, row * part_height, (col + 1) * part_width, (row + 1) * part_height))
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+def encode_mosaic_tiles(image_path, rows=2, cols=3, quality=MOSAIC_QUALITY, max_workers=None):
+    """
+    Разрезает изображение на части мозаики и кодирует их в JPEG в памяти
+
+    Изображение декодируется один раз, части кодируются параллельно
+    (кодировщик Pillow освобождает GIL).
+
+    Args:
+        image_path: Путь к изображению
+        rows: Количество рядов
+        cols: Количество колонок
+        quality: Качество JPEG
+        max_workers: Количество потоков кодирования (по умолчанию - по числу частей)
+
+    Returns:
+        list: Содержимое частей (bytes) по рядам слева направо
+    """
+    img = load_normalized_image(image_path)
+    tiles = split_image(img, rows, cols)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(tiles)) as executor:
+        return list(executor.map(lambda tile: encode_image(tile, 'JPEG', quality), tiles))
+
 def split_image_for_mosaic(image_path, rows=2, cols=3):
     """
     Разделяет изображение на части для мозаики в Instagram
     По умолчанию делит на 6 частей (2 ряда по 3 колонки)
     """
     try:
-        # Открываем изображение
-        img = Image.open(image_path)
-
-        # Получаем размеры изображения
-        width, height = img.size
-
-        # Вычисляем размеры каждой части
-        part_width = width // cols
-        part_height = height // rows
+        tiles = encode_mosaic_tiles(image_path, rows, cols)
 
         # Создаем директорию для частей, если её нет
         output_dir = Path(MEDIA_DIR) / "mosaic_parts"
@@ -31,39 +89,70 @@ def split_image_for_mosaic(image_path, rows=2, cols=3):
         # Генерируем уникальный идентификатор для этого набора частей
         unique_id = uuid.uuid4().hex[:8]
 
-        # Список путей к созданным частям
+        # Сохраняем части
         part_paths = []
+        for index, data in enumerate(tiles):
+            row, col = divmod(index, cols)
+            part_path = output_dir / f"mosaic_{unique_id}_r{row}_c{col}.jpg"
+            part_path.write_bytes(data)
+            part_paths.append(str(part_path))
 
-        # Разрезаем изображение на части
-        for row in range(rows):
-            for col in range(cols):
-                # Вычисляем координаты для вырезания части
-                left = col * part_width
-                upper = row * part_height
-                right = left + part_width
-                lower = upper + part_height
+        logger.info(f"Создано частей мозаики: {len(part_paths)} ({rows}x{cols})")
+        return part_paths
+    except Exception as e:
+        logger.error(f"Ошибка при разделении изображения на части: {e}")
+        return []
 
-                # Вырезаем часть
-                part = img.crop((left, upper, right, lower))
+# Значения качества при оптимизации изображения (от лучшего к худшему)
+OPTIMIZE_QUALITIES = list(range(95, 30, -5))
+# Качество и масштабы (в процентах от оригинала), если уменьшения качества недостаточно
+OPTIMIZE_RESIZE_QUALITY = 80
+OPTIMIZE_RESIZE_SCALES = [90, 80, 70, 60, 50]
 
-                # Сохраняем часть
-                part_filename = f"mosaic_{unique_id}_r{row}_c{col}.jpg"
-                part_path = output_dir / part_filename
-                part.save(part_path, quality=95)
+def encode_image(img, img_format, quality, optimize=False):
+    """Кодирует изображение в памяти и возвращает его содержимое"""
+    buffer = BytesIO()
+    img.save(buffer, format=img_format, quality=quality, optimize=optimize)
+    return buffer.getvalue()
 
-                # Добавляем путь в список
-                part_paths.append(str(part_path))
+def find_first_fitting(candidates, encode, max_size_bytes):
+    """
+    Находит первый вариант из списка, результат кодирования которого не превышает max_size_bytes
 
-                logger.info(f"Создана часть мозаики: {part_path}")
+    Варианты упорядочены от лучшего к худшему, размер результата по списку убывает.
+    Сначала проверяется лучший вариант (обычно он и подходит), затем
+    выполняется двоичный поиск по остальным.
 
-        return part_paths
-    except Exception as e:
-        logger.error(f"Ошибка при разделении изображения на части: {e}")
-        return []
+    Args:
+        candidates (list): Варианты (качество или масштаб)
+        encode (callable): Функция encode(вариант) -> bytes
+        max_size_bytes (int): Максимальный размер результата
+
+    Returns:
+        tuple: (вариант, содержимое) или (None, None), если не подходит ни один
+    """
+    data = encode(candidates[0])
+    if len(data) <= max_size_bytes:
+        return candidates[0], data
+
+    best = (None, None)
+    low, high = 1, len(candidates) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        data = encode(candidates[middle])
+        if len(data) <= max_size_bytes:
+            best = (candidates[middle], data)
+            high = middle - 1
+        else:
+            low = middle + 1
+    return best
 
 def optimize_image(image_path, max_size_kb=1024):
     """
     Оптимизирует изображение для загрузки в Instagram
+
+    Качество подбирается двоичным поиском с кодированием в памяти,
+    на диск записывается только итоговый результат.
     """
     try:
         # Открываем изображение
@@ -71,6 +160,7 @@ def optimize_image(image_path, max_size_kb=1024):
 
         # Сохраняем оригинальный формат
         img_format = img.format
+        max_size_bytes = max_size_kb * 1024
 
         # Создаем путь для оптимизированного изображения
         filename = os.path.basename(image_path)
@@ -78,46 +168,35 @@ def optimize_image(image_path, max_size_kb=1024):
         os.makedirs(output_dir, exist_ok=True)
         optimized_path = output_dir / f"opt_{filename}"
 
-        # Начальное качество
-        quality = 95
-
-        # Сохраняем с постепенным уменьшением качества, пока не достигнем нужного размера
-        while quality > 30:  # Минимальное качество 30%
-            img.save(optimized_path, format=img_format, quality=quality)
+        # Подбираем максимальное качество, при котором размер не превышает лимит
+        quality, data = find_first_fitting(
+            OPTIMIZE_QUALITIES,
+            lambda quality: encode_image(img, img_format, quality),
+            max_size_bytes
+        )
 
-            # Проверяем размер файла
-            file_size_kb = os.path.getsize(optimized_path) / 1024
+        if data is not None:
+            optimized_path.write_bytes(data)
+            logger.info(f"Изображение оптимизировано: {optimized_path} ({len(data) / 1024:.2f} KB, качество {quality}%)")
+            return str(optimized_path)
 
-            if file_size_kb <= max_size_kb:
-                logger.info(f"Изображение оптимизировано: {optimized_path} ({file_size_kb:.2f} KB, качество {quality}%)")
-                return str(optimized_path)
-
-            # Уменьшаем качество
-            quality -= 5
-
-        # Если не удалось достичь нужного размера, пробуем изменить размер изображения
+        # Если не удалось достичь нужного размера, подбираем наибольший подходящий масштаб
         width, height = img.size
-        ratio = 0.9  # Уменьшаем на 10%
-
-        while ratio > 0.5:  # Минимальный размер 50% от оригинала
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            resized_img = img.resize((new_width, new_height), Image.LANCZOS)
 
-            resized_img.save(optimized_path, format=img_format, quality=80)
+        def encode_scaled(scale):
+            new_size = (int(width * scale / 100), int(height * scale / 100))
+            return encode_image(img.resize(new_size, Image.LANCZOS), img_format, OPTIMIZE_RESIZE_QUALITY)
 
-            # Проверяем размер файла
-            file_size_kb = os.path.getsize(optimized_path) / 1024
+        scale, data = find_first_fitting(OPTIMIZE_RESIZE_SCALES, encode_scaled, max_size_bytes)
 
-            if file_size_kb <= max_size_kb:
-                logger.info(f"Изображение изменено и оптимизировано: {optimized_path} ({file_size_kb:.2f} KB, {new_width}x{new_height})")
-                return str(optimized_path)
-
-            # Уменьшаем размер
-            ratio -= 0.1
+        if data is not None:
+            optimized_path.write_bytes(data)
+            new_width, new_height = int(width * scale / 100), int(height * scale / 100)
+            logger.info(f"Изображение изменено и оптимизировано: {optimized_path} ({len(data) / 1024:.2f} KB, {new_width}x{new_height})")
+            return str(optimized_path)
 
         logger.warning(f"Не удалось оптимизировать изображение до {max_size_kb} KB: {image_path}")
         return image_path
     except Exception as e:
         logger.error(f"Ошибка при оптимизации изображения: {e}")
-        return image_path
\ No newline at end of file
+        return image_path
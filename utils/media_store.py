@@ -0,0 +1,258 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+import requests
+
+from config import (
+    MEDIA_STORE_DIR, MEDIA_DOWNLOAD_CHUNK_SIZE, MEDIA_DOWNLOAD_TIMEOUT, MEDIA_STORE_MAX_SIZE_MB,
+    MEDIA_GC_INTERVAL, MEDIA_GC_GRACE_PERIOD, MEDIA_SCRATCH_DIRS
+)
+from database.db_manager import (
+    get_media_file_by_source, add_media_file, get_media_reference_counts, delete_media_files
+)
+
+logger = logging.getLogger(__name__)
+
+class MediaStore:
+    """
+    Хранилище медиафайлов, адресуемое по содержимому.
+
+    Файл сохраняется под именем, равным SHA-256 его содержимого, поэтому
+    одинаковые файлы хранятся в одном экземпляре. Файлы из Telegram
+    скачиваются блоками, хеш вычисляется во время скачивания, а файл,
+    который уже есть в хранилище, повторно не скачивается.
+
+    Ссылками на файлы считаются невыполненные задачи на публикацию
+    (publish_tasks.media_path). Файлы без ссылок удаляются при очистке
+    (collect_garbage) после grace_period, а о превышении max_size_mb
+    сообщается в логе.
+    """
+
+    def __init__(self, store_dir=MEDIA_STORE_DIR, chunk_size=MEDIA_DOWNLOAD_CHUNK_SIZE,
+                 max_size_mb=MEDIA_STORE_MAX_SIZE_MB, grace_period=MEDIA_GC_GRACE_PERIOD,
+                 scratch_dirs=MEDIA_SCRATCH_DIRS):
+        """
+        Args:
+            store_dir (str): Директория хранилища
+            chunk_size (int): Размер блока при скачивании (в байтах)
+            max_size_mb (int): Максимальный размер хранилища (в мегабайтах)
+            grace_period (int): Сколько хранить файл без ссылок (в секундах)
+            scratch_dirs (list): Директории промежуточных файлов, очищаемые вместе с хранилищем
+        """
+        self.store_dir = str(store_dir)
+        self.chunk_size = chunk_size
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.grace_period = grace_period
+        self.scratch_dirs = [str(path) for path in scratch_dirs]
+        self._gc_lock = threading.Lock()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def path_for(self, sha256, suffix=''):
+        """Возвращает путь к файлу хранилища с указанным хешем"""
+        return os.path.join(self.store_dir, f"{sha256}{suffix}")
+
+    def contains(self, path):
+        """Проверяет, находится ли файл в хранилище"""
+        return os.path.dirname(os.path.abspath(str(path))) == os.path.abspath(self.store_dir)
+
+    def sha256_of(self, path):
+        """
+        Возвращает хеш содержимого файла хранилища по его имени, не читая файл.
+
+        Returns:
+            str: SHA-256 содержимого или None, если файл не из хранилища
+        """
+        if not self.contains(path):
+            return None
+        name = os.path.basename(str(path)).split('.', 1)[0]
+        return name if len(name) == 64 else None
+
+    def put_stream(self, chunks, suffix=''):
+        """
+        Сохраняет содержимое, передаваемое блоками, вычисляя хеш во время записи.
+
+        Args:
+            chunks (iterable): Блоки содержимого (bytes)
+            suffix (str): Расширение файла (например, '.mp4')
+
+        Returns:
+            tuple: (путь к файлу, sha256, размер)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.store_dir, f"download.{threading.get_ident()}.tmp{suffix}")
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            sha256 = digest.hexdigest()
+            path = self.path_for(sha256, suffix)
+            # Атомарный перенос: файл с тем же содержимым просто заменяется
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return path, sha256, size
+
+    def _iter_telegram_file(self, telegram_file):
+        """Читает файл Telegram блоками без сохранения во временный файл"""
+        file_path = telegram_file.file_path
+
+        # Локальный сервер Bot API возвращает путь к файлу на диске
+        if file_path and os.path.isfile(file_path):
+            with open(file_path, 'rb') as f:
+                yield from iter(lambda: f.read(self.chunk_size), b'')
+            return
+
+        with requests.get(file_path, stream=True, timeout=MEDIA_DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            yield from response.iter_content(chunk_size=self.chunk_size)
+
+    def download_telegram_file(self, telegram_file, suffix=None):
+        """
+        Скачивает файл Telegram в хранилище.
+
+        Если файл с тем же file_unique_id уже скачан, возвращается путь к
+        нему без обращения к Telegram.
+
+        Args:
+            telegram_file (File): Файл Telegram (результат get_file)
+            suffix (str): Расширение файла (по умолчанию берется из пути файла в Telegram)
+
+        Returns:
+            str: Путь к файлу в хранилище
+        """
+        if suffix is None:
+            suffix = os.path.splitext(telegram_file.file_path or '')[1]
+
+        media_file = get_media_file_by_source(telegram_file.file_unique_id)
+        if media_file and os.path.exists(media_file.path):
+            # Время изменения файла - время последнего использования (для очистки по LRU)
+            os.utime(media_file.path)
+            logger.info(f"Файл {telegram_file.file_unique_id} уже есть в хранилище: {media_file.path}")
+            return media_file.path
+
+        path, sha256, size = self.put_stream(self._iter_telegram_file(telegram_file), suffix)
+        add_media_file(telegram_file.file_unique_id, sha256, path, size)
+
+        logger.info(f"Файл {telegram_file.file_unique_id} сохранен в хранилище: {path} ({size} байт)")
+        return path
+
+    def _scan(self, directory, recursive=False):
+        """Возвращает файлы директории [(mtime, size, path)], пропуская недокачанные"""
+        entries = []
+        if not os.path.isdir(directory):
+            return entries
+
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if '.tmp' in name:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            if not recursive:
+                break
+
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError as e:
+            logger.warning(f"Не удалось удалить медиафайл {path}: {e}")
+            return False
+
+    def collect_garbage(self):
+        """
+        Удаляет медиафайлы, на которые не ссылается ни одна невыполненная задача.
+
+        Файл без ссылок удаляется, если не использовался дольше grace_period
+        (это время, за которое пользователь успевает создать задачу после
+        загрузки файла). Файлы, на которые ссылаются задачи, и файлы моложе
+        grace_period не удаляются, даже если хранилище больше max_size_mb -
+        в этом случае выводится предупреждение.
+
+        Returns:
+            dict: {'removed': количество удаленных файлов, 'freed': освобождено байт, 'size': размер хранилища}
+        """
+        with self._gc_lock:
+            reference_counts = get_media_reference_counts()
+            if reference_counts is None:
+                # Без данных о ссылках нельзя безопасно удалять файлы
+                logger.warning("Очистка медиафайлов пропущена: не удалось получить ссылки из задач")
+                return {'removed': 0, 'freed': 0, 'size': None}
+
+            referenced = {os.path.abspath(path) for path, count in reference_counts.items() if count > 0}
+            expire_before = time.time() - self.grace_period
+
+            store_entries = []
+            removed_paths = []
+            freed = 0
+
+            # Файлы хранилища: удаляем просроченные файлы без ссылок
+            for mtime, size, path in self._scan(self.store_dir):
+                if os.path.abspath(path) not in referenced and mtime < expire_before and self._remove(path):
+                    removed_paths.append(path)
+                    freed += size
+                else:
+                    store_entries.append((mtime, size, path))
+
+            # Ограничение размера хранилища: файлы, на которые ссылаются задачи, и файлы моложе
+            # grace_period (на них еще могут не успеть создать задачу) не удаляются даже сверх лимита,
+            # а остальные файлы без ссылок уже удалены выше
+            total_size = sum(size for _, size, _ in store_entries)
+            if total_size > self.max_size_bytes:
+                logger.warning(f"Хранилище медиа превышает лимит ({total_size // (1024 * 1024)} МБ), "
+                               f"но все оставшиеся файлы используются задачами или загружены недавно")
+
+            # Промежуточные файлы (части мозаики, оптимизированные изображения и т.п.)
+            for directory in self.scratch_dirs:
+                for mtime, size, path in self._scan(directory, recursive=True):
+                    if os.path.abspath(path) not in referenced and mtime < expire_before and self._remove(path):
+                        removed_paths.append(path)
+                        freed += size
+
+            delete_media_files(removed_paths)
+
+            if removed_paths:
+                logger.info(f"Очистка медиафайлов: удалено {len(removed_paths)} файлов, "
+                            f"освобождено {freed / (1024 * 1024):.1f} МБ")
+
+            return {'removed': len(removed_paths), 'freed': freed, 'size': total_size}
+
+def run_media_gc(interval=MEDIA_GC_INTERVAL, stop_event=None):
+    """
+    Периодически очищает хранилище медиа (запускается в отдельном потоке)
+
+    Args:
+        interval (int): Интервал между очистками (в секундах)
+        stop_event (threading.Event): Событие остановки (опционально)
+    """
+    stop_event = stop_event or threading.Event()
+    logger.info("Запущена периодическая очистка медиафайлов")
+
+    while not stop_event.is_set():
+        try:
+            media_store.collect_garbage()
+        except Exception as e:
+            logger.error(f"Ошибка при очистке медиафайлов: {e}")
+        stop_event.wait(interval)
+
+# Общее хранилище медиафайлов
+media_store = MediaStore()
@@ -0,0 +1,88 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Этапы публикации
+STAGE_ENCODE = 'encode'
+STAGE_UPLOAD = 'upload'
+STAGE_DONE = 'done'
+STAGE_ERROR = 'error'
+
+STAGE_TITLES = {
+    STAGE_ENCODE: "🎬 Обработка видео",
+    STAGE_UPLOAD: "📤 Загрузка и публикация в Instagram",
+    STAGE_DONE: "✅ Публикация завершена",
+    STAGE_ERROR: "❌ Ошибка публикации"
+}
+
+class ProgressBus:
+    """
+    Шина событий о ходе выполнения задач на публикацию.
+
+    Этапы публикации (обработка, загрузка) отправляют события по ID задачи,
+    а подписчики (например, сообщение со статусом в Telegram) получают их.
+    Если подписчиков нет, события просто отбрасываются.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, task_id, callback):
+        """
+        Подписывает callback(event) на события задачи.
+
+        Args:
+            task_id (int): ID задачи на публикацию
+            callback (callable): Функция, получающая событие
+                {'task_id', 'stage', 'percent', 'message'}
+        """
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append(callback)
+
+    def unsubscribe(self, task_id, callback):
+        """Отменяет подписку на события задачи"""
+        with self._lock:
+            callbacks = self._subscribers.get(task_id, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._subscribers.pop(task_id, None)
+
+    def emit(self, task_id, stage, percent=None, message=None):
+        """
+        Отправляет событие подписчикам задачи.
+
+        Args:
+            task_id (int): ID задачи на публикацию (None - событие никому не отправляется)
+            stage (str): Этап (STAGE_ENCODE, STAGE_UPLOAD, ...)
+            percent (int): Процент выполнения этапа (опционально)
+            message (str): Дополнительное описание (опционально)
+        """
+        if task_id is None:
+            return
+
+        with self._lock:
+            callbacks = list(self._subscribers.get(task_id, []))
+
+        event = {'task_id': task_id, 'stage': stage, 'percent': percent, 'message': message}
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Ошибка в обработчике события задачи {task_id}: {e}")
+
+def format_event(event):
+    """Формирует текст сообщения о ходе выполнения задачи"""
+    text = STAGE_TITLES.get(event['stage'], event['stage'])
+    if event['percent'] is not None:
+        text += f"... {event['percent']}%"
+    elif event['stage'] not in (STAGE_DONE, STAGE_ERROR):
+        text += "..."
+    if event['message']:
+        text += f"\n{event['message']}"
+    return text
+
+# Общая шина событий о ходе публикации
+progress_bus = ProgressBus()
@@ -30,8 +30,14 @@ def check_proxy(proxy_id, proxy_url):
         logger.error(f"Ошибка при проверке прокси {proxy_url}: {e}")
         return proxy_id, False, str(e)
 
-def check_all_proxies():
-    """Проверка всех прокси в базе данных"""
+def check_all_proxies(progress_callback=None):
+    """
+    Проверка всех прокси в базе данных
+
+    Args:
+        progress_callback (callable): Функция progress_callback(checked, total),
+            вызываемая после каждого проверенного прокси (опционально)
+    """
     from database.db_manager import Session
     from database.models import Proxy
 
@@ -60,6 +66,9 @@ def check_all_proxies():
                 except Exception as e:
                     logger.error(f"Ошибка при обработке результата проверки прокси: {e}")
 
+                if progress_callback:
+                    progress_callback(len(results), len(proxies))
+
         return results
     except Exception as e:
         logger.error(f"Ошибка при проверке прокси: {e}")
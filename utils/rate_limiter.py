@@ -0,0 +1,174 @@
+import time
+import logging
+import threading
+
+from config import (
+    INSTAGRAM_PUBLISH_INTERVAL, INSTAGRAM_PUBLISH_BURST, INSTAGRAM_DELAY_BETWEEN_REQUESTS,
+    INSTAGRAM_ACCOUNT_BURST, INSTAGRAM_PROXY_REQUEST_INTERVAL, INSTAGRAM_PROXY_BURST
+)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucketLimiter:
+    """
+    Ограничитель частоты операций "корзина токенов" с отдельной корзиной для каждого ключа.
+
+    Корзина вмещает до burst токенов и пополняется со скоростью rate токенов
+    в секунду; каждая операция забирает один токен. Если токенов нет,
+    операция резервирует следующий и ждет его появления, поэтому потоки,
+    ожидающие одну корзину, выполняются по очереди с интервалом 1 / rate.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate (float): Скорость пополнения корзины (токенов в секунду)
+            burst (int): Вместимость корзины (сколько операций можно выполнить подряд без ожидания)
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key):
+        """
+        Забирает токен из корзины key.
+
+        Returns:
+            float: Сколько секунд нужно подождать до выполнения операции
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate) - 1
+            self._buckets[key] = (tokens, now)
+        return -tokens / self.rate if tokens < 0 else 0
+
+    def acquire(self, key):
+        """
+        Блокирует поток, пока в корзине key не появится токен.
+
+        Returns:
+            float: Сколько секунд поток ждал
+        """
+        delay = self.reserve(key)
+        if delay > 0:
+            logger.debug(f"Ограничение частоты для {key}: ожидание {delay:.1f} сек")
+            time.sleep(delay)
+        return delay
+
+class InstagramRateLimiter:
+    """
+    Ограничитель запросов к Instagram: отдельные корзины для каждого аккаунта и каждого прокси.
+
+    Запрос выполняется, когда есть токен и в корзине аккаунта, и в корзине
+    прокси, через который он отправляется. Так аккаунт не превышает
+    ограничения Instagram на действия, а много аккаунтов за одним прокси
+    не превышают ограничения на IP.
+    """
+
+    def __init__(self, account_interval=INSTAGRAM_DELAY_BETWEEN_REQUESTS, account_burst=INSTAGRAM_ACCOUNT_BURST,
+                 proxy_interval=INSTAGRAM_PROXY_REQUEST_INTERVAL, proxy_burst=INSTAGRAM_PROXY_BURST):
+        """
+        Args:
+            account_interval (float): Средний интервал между запросами одного аккаунта (в секундах)
+            account_burst (int): Сколько запросов аккаунт может выполнить подряд без ожидания
+            proxy_interval (float): Средний интервал между запросами через один прокси (в секундах)
+            proxy_burst (int): Сколько запросов через один прокси можно выполнить подряд без ожидания
+        """
+        self.accounts = TokenBucketLimiter(1 / account_interval, account_burst)
+        self.proxies = TokenBucketLimiter(1 / proxy_interval, proxy_burst)
+
+    def acquire(self, account_key=None, proxy_key=None):
+        """
+        Блокирует поток, пока запрос от аккаунта account_key через прокси proxy_key не будет разрешен.
+
+        Args:
+            account_key: Ключ аккаунта (ID или имя пользователя; None - без ограничения по аккаунту)
+            proxy_key (str): URL прокси (None - прямое соединение, без ограничения по прокси)
+
+        Returns:
+            float: Сколько секунд поток ждал
+        """
+        delays = []
+        if account_key is not None:
+            delays.append(self.accounts.reserve(account_key))
+        if proxy_key:
+            delays.append(self.proxies.reserve(proxy_key))
+
+        delay = max(delays, default=0)
+        if delay > 0:
+            logger.debug(f"Ограничение частоты запросов (аккаунт {account_key}, прокси {proxy_key}): "
+                         f"ожидание {delay:.1f} сек")
+            time.sleep(delay)
+        return delay
+
+class RateLimitedClient:
+    """
+    Обертка клиента instagrapi: каждый вызов метода API проходит через ограничитель запросов.
+
+    Методы, не обращающиеся к Instagram (настройки, прокси), вызываются
+    без ожидания. Прокси, установленный через set_proxy, запоминается и
+    используется как ключ ограничения по прокси. Вложенные запросы внутри
+    методов instagrapi (например, загрузка и публикация в photo_upload)
+    не ограничиваются повторно.
+
+    Обработчики on_success() и on_error(exception) вызываются после
+    каждого запроса (например, чтобы отмечать, что сессия активна).
+    """
+
+    # Методы клиента, которые не отправляют запросов в Instagram
+    LOCAL_METHODS = {
+        'get_settings', 'set_settings', 'load_settings', 'dump_settings', 'set_proxy',
+        'set_device', 'set_user_agent', 'set_uuids', 'set_locale', 'set_country',
+        'set_country_code', 'set_timezone_offset', 'set_ig_u_rur', 'set_ig_www_claim'
+    }
+
+    def __init__(self, client, account_key=None, limiter=None, on_success=None, on_error=None):
+        """
+        Args:
+            client (Client): Клиент instagrapi
+            account_key: Ключ аккаунта для ограничения (ID аккаунта или имя пользователя)
+            limiter (InstagramRateLimiter): Ограничитель запросов (по умолчанию общий)
+            on_success (callable): Вызывается после успешного запроса (опционально)
+            on_error (callable): Вызывается с исключением после неудачного запроса (опционально)
+        """
+        object.__setattr__(self, '_client', client)
+        object.__setattr__(self, '_account_key', account_key)
+        object.__setattr__(self, '_limiter', limiter or instagram_rate_limiter)
+        object.__setattr__(self, '_proxy_key', None)
+        object.__setattr__(self, '_on_success', on_success)
+        object.__setattr__(self, '_on_error', on_error)
+
+    def set_proxy(self, dsn):
+        """Устанавливает прокси клиента и запоминает его для ограничения по прокси"""
+        object.__setattr__(self, '_proxy_key', dsn or None)
+        return self._client.set_proxy(dsn)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or name in self.LOCAL_METHODS or not callable(attr):
+            return attr
+
+        def limited(*args, **kwargs):
+            self._limiter.acquire(self._account_key, self._proxy_key)
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                if self._on_error:
+                    self._on_error(e)
+                raise
+            if self._on_success:
+                self._on_success()
+            return result
+
+        return limited
+
+    def __setattr__(self, name, value):
+        setattr(self._client, name, value)
+
+# Общий ограничитель запросов к Instagram (по аккаунтам и прокси)
+instagram_rate_limiter = InstagramRateLimiter()
+
+# Общий ограничитель публикаций: одна корзина на аккаунт Instagram
+publish_rate_limiter = TokenBucketLimiter(1 / INSTAGRAM_PUBLISH_INTERVAL, INSTAGRAM_PUBLISH_BURST)
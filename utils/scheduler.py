@@ -1,13 +1,21 @@
 import logging
 import time
+import heapq
 import threading
-import schedule
 import datetime
 
-from database.db_manager import get_pending_tasks, update_publish_task_status
+from config import (
+    WORKER_ID, TASK_LEASE_SECONDS, TASK_HEARTBEAT_INTERVAL, WORKER_POLL_INTERVAL, WORKER_RECLAIM_INTERVAL
+)
+from database.db_manager import (
+    get_pending_tasks, get_publish_task, update_task_status, add_task_created_listener,
+    claim_due_tasks, reclaim_expired_leases, extend_task_leases
+)
+from database.models import TaskStatus
 from instagram.profile_manager import ProfileManager
 from instagram.post_manager import PostManager
 from instagram.reels_manager import ReelsManager
+from utils.task_executor import TaskExecutor, run_executor_stats_logger
 
 logger = logging.getLogger(__name__)
 
@@ -39,34 +47,194 @@ def execute_task(task):
         logger.error(f"Ошибка при выполнении задачи {task.id}: {e}")
         update_task_status(task.id, 'failed', error_message=str(e))
 
-def check_scheduled_tasks():
-    """Проверка и выполнение запланированных задач"""
+class TaskLeaseHeartbeat:
+    """
+    Периодически продлевает аренду задач, которые выполняет обработчик,
+    чтобы долгие публикации не были захвачены повторно.
+    """
+
+    def __init__(self, owner, interval=TASK_HEARTBEAT_INTERVAL, lease_seconds=TASK_LEASE_SECONDS):
+        """
+        Args:
+            owner (str): Идентификатор обработчика
+            interval (int): Интервал продления аренды (в секундах)
+            lease_seconds (int): Время аренды (в секундах)
+        """
+        self.owner = owner
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self._task_ids = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, task_id):
+        with self._lock:
+            self._task_ids.add(task_id)
+
+    def remove(self, task_id):
+        with self._lock:
+            self._task_ids.discard(task_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._task_ids)
+
+    def start(self):
+        """Запускает поток продления аренды"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.owner}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает поток продления аренды"""
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                task_ids = list(self._task_ids)
+            if task_ids:
+                extend_task_leases(self.owner, task_ids, self.lease_seconds)
+
+def execute_leased_task(task, heartbeat):
+    """Выполняет захваченную задачу и прекращает продление ее аренды по завершении"""
     try:
-        # Получаем текущее время
-        now = datetime.datetime.utcnow()
+        execute_task(task)
+    finally:
+        heartbeat.remove(task.id)
 
-        # Получаем все запланированные задачи
-        tasks = get_scheduled_tasks()
+class ScheduledTaskQueue:
+    """
+    Очередь запланированных задач с приоритетом по времени выполнения.
 
-        for task in tasks:
-            # Если время выполнения задачи наступило или прошло
-            if task.scheduled_time and task.scheduled_time <= now:
-                # Запускаем выполнение задачи в отдельном потоке
-                threading.Thread(target=execute_task, args=(task,)).start()
-    except Exception as e:
-        logger.error(f"Ошибка при проверке запланированных задач: {e}")
+    Задачи хранятся в куче, упорядоченной по scheduled_time. Рабочий поток
+    спит ровно до времени ближайшей задачи и просыпается раньше, только если
+    в очередь добавлена более ранняя задача.
+    """
+
+    def __init__(self):
+        self._heap = []  # (scheduled_time, task_id)
+        self._condition = threading.Condition()
+
+    def push(self, task_id, scheduled_time):
+        """Добавляет задачу в очередь"""
+        if scheduled_time is None:
+            return
+
+        with self._condition:
+            heapq.heappush(self._heap, (scheduled_time, task_id))
+            # Будим рабочий поток, чтобы он пересчитал время ожидания
+            self._condition.notify()
+
+    def load_from_db(self):
+        """Загружает ожидающие запланированные задачи из базы данных"""
+        tasks = [task for task in get_pending_tasks() if task.scheduled_time is not None]
+
+        with self._condition:
+            for task in tasks:
+                heapq.heappush(self._heap, (task.scheduled_time, task.id))
+            self._condition.notify()
+
+        logger.info(f"В очередь планировщика загружено задач: {len(tasks)}")
+        return len(tasks)
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap)
+
+    def pop_due(self, timeout=None):
+        """
+        Ожидает наступления времени ближайшей задачи и возвращает все задачи,
+        время которых уже наступило.
+
+        Args:
+            timeout (float): Максимальное время ожидания (в секундах; None - без ограничения)
+
+        Returns:
+            list: ID задач, готовых к выполнению (пустой список, если время ожидания истекло)
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        with self._condition:
+            while True:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return []
+
+                if not self._heap:
+                    self._condition.wait(timeout=remaining)
+                    continue
+
+                delay = (self._heap[0][0] - datetime.datetime.now()).total_seconds()
+                if delay > 0:
+                    self._condition.wait(timeout=min(delay, remaining) if remaining is not None else delay)
+                    continue
+
+                now = datetime.datetime.now()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+                return due
+
+# Общая очередь планировщика процесса
+task_queue = ScheduledTaskQueue()
+
+# Ограниченный пул потоков для выполнения задач
+task_executor = TaskExecutor(name="scheduler-worker")
+
+# Продление аренды задач, выполняемых планировщиком
+task_heartbeat = TaskLeaseHeartbeat(WORKER_ID)
+
+def dispatch_tasks(task_ids):
+    """Захватывает готовые задачи и передает их на выполнение"""
+    # Захват атомарный: задачу, уже взятую другим обработчиком, мы не получим
+    tasks = claim_due_tasks(WORKER_ID, limit=len(task_ids), task_ids=task_ids)
+    claimed_ids = {task.id for task in tasks}
+
+    for task_id in task_ids:
+        if task_id in claimed_ids:
+            continue
+
+        # Задачу могли перенести на более позднее время, или ее аккаунт занят другой задачей
+        task = get_publish_task(task_id)
+        if task and task.status == TaskStatus.PENDING and task.scheduled_time:
+            retry_time = datetime.datetime.now() + datetime.timedelta(seconds=WORKER_POLL_INTERVAL)
+            task_queue.push(task.id, max(task.scheduled_time, retry_time))
+
+    for task in tasks:
+        # Передаем задачу в пул; задачи одного аккаунта выполняются по очереди
+        task_heartbeat.add(task.id)
+        task_executor.submit(task.account_id, execute_leased_task, task, task_heartbeat)
 
 def start_scheduler():
     """Запуск планировщика задач"""
     try:
-        # Проверяем запланированные задачи каждую минуту
-        schedule.every(1).minutes.do(check_scheduled_tasks)
+        # Новые задачи (и задачи с истекшей арендой) попадают в очередь через обработчик создания
+        add_task_created_listener(task_queue.push)
+        task_queue.load_from_db()
+        task_executor.start()
+        task_heartbeat.start()
+        threading.Thread(target=run_executor_stats_logger, args=(task_executor,), daemon=True).start()
 
         logger.info("Планировщик задач запущен")
 
-        # Бесконечный цикл для выполнения запланированных задач
+        last_reclaim = 0.0
+
         while True:
-            schedule.run_pending()
-            time.sleep(10)  # Пауза между проверками
+            # Возвращаем задачи, аренда которых истекла (например, после падения процесса)
+            if time.monotonic() - last_reclaim >= WORKER_RECLAIM_INTERVAL:
+                reclaim_expired_leases()
+                last_reclaim = time.monotonic()
+
+            task_ids = task_queue.pop_due(timeout=WORKER_RECLAIM_INTERVAL)
+            if not task_ids:
+                continue
+
+            try:
+                dispatch_tasks(task_ids)
+            except Exception as e:
+                logger.error(f"Ошибка при запуске задач {task_ids}: {e}")
     except Exception as e:
-        logger.error(f"Ошибка в планировщике задач: {e}")
\ No newline at end of file
+        logger.error(f"Ошибка в планировщике задач: {e}")
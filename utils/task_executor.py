@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from config import MAX_WORKERS, TASK_QUEUE_MAX_SIZE, EXECUTOR_STATS_LOG_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class TaskExecutor:
+    """
+    Ограниченный пул потоков для выполнения задач на публикацию.
+
+    Задачи ставятся в очередь ожидания и выполняются не более чем в
+    max_workers потоках. Задачи одного аккаунта выполняются строго по
+    очереди: пока аккаунт занят, его задачи пропускаются и берутся задачи
+    других аккаунтов. Когда очередь заполнена, submit блокируется.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queue_size=TASK_QUEUE_MAX_SIZE, name="task-executor"):
+        """
+        Args:
+            max_workers (int): Количество рабочих потоков
+            max_queue_size (int): Максимальный размер очереди ожидания
+            name (str): Префикс имен рабочих потоков
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._queue = deque()  # (account_id, func, args, kwargs, время постановки в очередь)
+        self._busy_accounts = set()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._running = False
+
+        # Метрики
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def start(self):
+        """Запускает рабочие потоки"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"{self.name}-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        logger.info(f"Пул выполнения задач запущен ({self.max_workers} потоков)")
+
+    def shutdown(self, wait=True):
+        """Останавливает рабочие потоки после выполнения уже начатых задач"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        self._workers = []
+
+    def submit(self, account_id, func, *args, timeout=None, **kwargs):
+        """
+        Ставит задачу в очередь на выполнение.
+
+        Args:
+            account_id (int): ID аккаунта, задачи которого выполняются последовательно
+            func (callable): Выполняемая функция
+            timeout (float): Максимальное время ожидания места в очереди (None - без ограничения)
+
+        Returns:
+            bool: True, если задача поставлена в очередь, False, если очередь переполнена
+        """
+        with self._condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            while len(self._queue) >= self.max_queue_size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning(f"Очередь задач переполнена ({len(self._queue)}), задача аккаунта {account_id} отклонена")
+                    return False
+                self._condition.wait(timeout=remaining)
+
+            self._queue.append((account_id, func, args, kwargs, time.monotonic()))
+            self._submitted += 1
+            self._condition.notify_all()
+            return True
+
+    def get_stats(self):
+        """
+        Возвращает метрики очереди.
+
+        Returns:
+            dict: Глубина очереди, количество выполняемых задач и время ожидания (в секундах)
+        """
+        with self._condition:
+            started = self._completed + self._failed + self._active
+            return {
+                'queue_depth': len(self._queue),
+                'active': self._active,
+                'busy_accounts': len(self._busy_accounts),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'avg_wait': self._total_wait / started if started else 0.0,
+                'max_wait': self._max_wait
+            }
+
+    def _next_item(self):
+        # Берем первую задачу, аккаунт которой сейчас свободен
+        for index, item in enumerate(self._queue):
+            if item[0] not in self._busy_accounts:
+                del self._queue[index]
+                return item
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                item = None
+                while self._running:
+                    item = self._next_item()
+                    if item is not None:
+                        break
+                    self._condition.wait()
+
+                if item is None:
+                    return
+
+                account_id, func, args, kwargs, enqueued_at = item
+                wait_time = time.monotonic() - enqueued_at
+
+                self._busy_accounts.add(account_id)
+                self._active += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+                queue_depth = len(self._queue)
+                # Освободилось место в очереди
+                self._condition.notify_all()
+
+            logger.debug(f"Задача аккаунта {account_id} запущена после ожидания {wait_time:.2f} с, в очереди {queue_depth}")
+
+            failed = False
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                logger.error(f"Ошибка при выполнении задачи аккаунта {account_id}: {e}")
+            finally:
+                with self._condition:
+                    self._busy_accounts.discard(account_id)
+                    self._active -= 1
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+                    # Задачи этого аккаунта снова могут быть взяты в работу
+                    self._condition.notify_all()
+
+def run_executor_stats_logger(executor, interval=EXECUTOR_STATS_LOG_INTERVAL, stop_event=None):
+    """
+    Периодически записывает в лог метрики очереди пула выполнения задач (запускается в отдельном потоке)
+
+    Args:
+        executor (TaskExecutor): Пул выполнения задач
+        interval (int): Интервал между записями (в секундах)
+        stop_event (threading.Event): Событие остановки (опционально)
+    """
+    stop_event = stop_event or threading.Event()
+
+    while not stop_event.wait(interval):
+        stats = executor.get_stats()
+        logger.info(
+            f"Очередь {executor.name}: в очереди {stats['queue_depth']}, выполняется {stats['active']}, "
+            f"выполнено {stats['completed']}, с ошибкой {stats['failed']}, "
+            f"ожидание в очереди: среднее {stats['avg_wait']:.1f} с, максимальное {stats['max_wait']:.1f} с"
+        )
@@ -0,0 +1,93 @@
+import logging
+import multiprocessing
+import threading
+import time
+
+from config import (
+    WORKER_ID, MAX_WORKERS, WORKER_POLL_INTERVAL, WORKER_RECLAIM_INTERVAL
+)
+from database.db_manager import engine, claim_due_tasks, reclaim_expired_leases
+from utils.scheduler import TaskLeaseHeartbeat, execute_leased_task
+from utils.task_executor import TaskExecutor, run_executor_stats_logger
+from instagram.client import run_session_stats_logger
+
+logger = logging.getLogger(__name__)
+
+def run_worker(worker_id=WORKER_ID, max_workers=MAX_WORKERS, poll_interval=WORKER_POLL_INTERVAL, stop_event=None):
+    """
+    Запускает обработчик задач на публикацию, работающий с общей таблицей publish_tasks.
+
+    Несколько таких обработчиков (в разных процессах или на разных машинах)
+    могут работать одновременно: задачи распределяются между ними через
+    атомарный захват с арендой, а аренда выполняемых задач продлевается.
+
+    Args:
+        worker_id (str): Уникальный идентификатор обработчика
+        max_workers (int): Количество потоков выполнения задач
+        poll_interval (float): Пауза между проверками, если готовых задач нет (в секундах)
+        stop_event (threading.Event): Событие для остановки обработчика (опционально)
+    """
+    # Соединения, унаследованные от родительского процесса, использовать нельзя,
+    # но и закрывать их нельзя: они по-прежнему принадлежат родителю
+    engine.dispose(close=False)
+
+    stop_event = stop_event or threading.Event()
+    executor = TaskExecutor(max_workers=max_workers, name=f"worker-{worker_id}")
+    heartbeat = TaskLeaseHeartbeat(worker_id)
+
+    executor.start()
+    heartbeat.start()
+
+    # У каждого процесса своя статистика проверок сессий и своя очередь выполнения
+    threading.Thread(target=run_session_stats_logger, kwargs={'stop_event': stop_event}, daemon=True).start()
+    threading.Thread(target=run_executor_stats_logger, args=(executor,), kwargs={'stop_event': stop_event},
+                     daemon=True).start()
+    logger.info(f"Обработчик задач {worker_id} запущен")
+
+    last_reclaim = 0.0
+
+    try:
+        while not stop_event.is_set():
+            # Задачи упавших обработчиков возвращаются в очередь
+            if time.monotonic() - last_reclaim >= WORKER_RECLAIM_INTERVAL:
+                reclaim_expired_leases()
+                last_reclaim = time.monotonic()
+
+            # Захватываем не больше задач, чем есть свободных потоков,
+            # чтобы остальные задачи достались другим обработчикам
+            capacity = max_workers - len(heartbeat)
+            tasks = claim_due_tasks(worker_id, limit=capacity) if capacity > 0 else []
+
+            for task in tasks:
+                heartbeat.add(task.id)
+                executor.submit(task.account_id, execute_leased_task, task, heartbeat)
+
+            if not tasks:
+                stop_event.wait(poll_interval)
+    finally:
+        heartbeat.stop()
+        executor.shutdown(wait=True)
+        logger.info(f"Обработчик задач {worker_id} остановлен")
+
+def start_worker_processes(processes, max_workers=MAX_WORKERS):
+    """
+    Запускает несколько процессов-обработчиков и ждет их завершения.
+
+    Args:
+        processes (int): Количество процессов
+        max_workers (int): Количество потоков в каждом процессе
+    """
+    workers = []
+    for i in range(processes):
+        process = multiprocessing.Process(
+            target=run_worker,
+            kwargs={'worker_id': f"{WORKER_ID}-{i}", 'max_workers': max_workers},
+            name=f"publish-worker-{i}"
+        )
+        process.start()
+        workers.append(process)
+
+    logger.info(f"Запущено процессов-обработчиков: {processes}")
+
+    for process in workers:
+        process.join()
@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import VIDEO_CACHE_DIR, VIDEO_CACHE_MAX_SIZE_MB
+
+logger = logging.getLogger(__name__)
+
+# Размер блока при вычислении хеша файла
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    """Вычисляет SHA-256 содержимого файла, читая его блоками"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class VideoCache:
+    """
+    Кеш обработанных видео, адресуемый по содержимому.
+
+    Ключ кеша - хеш исходного файла и параметров обработки, поэтому один и
+    тот же ролик, публикуемый в несколько аккаунтов, кодируется один раз.
+    При превышении размера удаляются давно не использовавшиеся файлы (LRU).
+    Файлы, закрепленные на время публикации (pin), не удаляются.
+    """
+
+    def __init__(self, cache_dir=VIDEO_CACHE_DIR, max_size_mb=VIDEO_CACHE_MAX_SIZE_MB):
+        """
+        Args:
+            cache_dir (str): Директория кеша
+            max_size_mb (int): Максимальный размер кеша (в мегабайтах)
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        # Блокировки ключей: {ключ: [блокировка, количество потоков, которые ее держат или ждут]}
+        self._key_locks = {}
+        # Закрепленные файлы: {путь: количество закреплений}
+        self._pinned = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, video_path, params, source_hash=None):
+        """
+        Вычисляет ключ кеша.
+
+        Args:
+            video_path (str): Путь к исходному видео
+            params (dict): Параметры обработки
+            source_hash (str): Уже известный SHA-256 исходного видео (чтобы не читать файл повторно)
+
+        Returns:
+            str: Ключ кеша
+        """
+        digest = hashlib.sha256()
+        digest.update((source_hash or file_sha256(video_path)).encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    @contextmanager
+    def key_lock(self, key):
+        """
+        Удерживает блокировку ключа, чтобы одно и то же видео не кодировалось параллельно.
+
+        Блокировка удаляется, когда ее никто не держит и не ждет, поэтому
+        количество блокировок не растет с количеством обработанных видео.
+        """
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def path_for(self, key, suffix='.mp4'):
+        """Возвращает путь к файлу кеша для ключа"""
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def temp_path_for(self, key, suffix='.mp4'):
+        """Возвращает путь для временного файла в директории кеша (для атомарного переноса)"""
+        return os.path.join(self.cache_dir, f"{key}.{threading.get_ident()}.tmp{suffix}")
+
+    def _pin_locked(self, path):
+        self._pinned[path] = self._pinned.get(path, 0) + 1
+
+    def get(self, key, suffix='.mp4', pin=False):
+        """
+        Возвращает путь к закешированному файлу или None.
+
+        Время изменения файла обновляется, чтобы он считался недавно использованным.
+
+        Args:
+            key (str): Ключ кеша
+            pin (bool): Закрепить файл до вызова release (чтобы он не был удален во время публикации)
+        """
+        path = self.path_for(key, suffix)
+        with self._lock:
+            try:
+                os.utime(path)
+            except OSError:
+                return None
+            if pin:
+                self._pin_locked(path)
+        return path
+
+    def put(self, key, source_path, suffix='.mp4', pin=False):
+        """
+        Перемещает обработанный файл в кеш.
+
+        Args:
+            key (str): Ключ кеша
+            source_path (str): Путь к обработанному файлу (будет перемещен)
+            pin (bool): Закрепить файл до вызова release
+
+        Returns:
+            str: Путь к файлу в кеше
+        """
+        path = self.path_for(key, suffix)
+        with self._lock:
+            os.replace(source_path, path)
+            if pin:
+                self._pin_locked(path)
+        self.evict(keep=path)
+        return path
+
+    def release(self, path):
+        """Снимает закрепление файла (для незакрепленных файлов ничего не делает)"""
+        with self._lock:
+            count = self._pinned.get(path)
+            if count is None:
+                return
+            if count > 1:
+                self._pinned[path] = count - 1
+            else:
+                del self._pinned[path]
+
+    def evict(self, keep=None):
+        """
+        Удаляет давно не использовавшиеся файлы, пока размер кеша превышает лимит.
+
+        Args:
+            keep (str): Путь к файлу, который удалять нельзя (только что добавленный)
+
+        Returns:
+            int: Количество удаленных файлов
+        """
+        with self._lock:
+            entries = []
+            total_size = 0
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if '.tmp' in name or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size_bytes:
+                    break
+                if path == keep or path in self._pinned:
+                    continue
+                try:
+                    os.remove(path)
+                    total_size -= size
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Не удалось удалить файл кеша {path}: {e}")
+
+            if removed:
+                logger.info(f"Из кеша видео удалено файлов: {removed}")
+            return removed
+
+# Общий кеш обработанных видео
+video_cache = VideoCache()
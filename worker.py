@@ -0,0 +1,37 @@
+import argparse
+import logging
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_FILE, MAX_WORKERS, WORKER_PROCESSES
+from database.db_manager import init_db
+from utils.task_worker import run_worker, start_worker_processes
+
+# Настраиваем логирование
+logging.basicConfig(
+    format=LOG_FORMAT,
+    level=getattr(logging, LOG_LEVEL),
+    handlers=[
+        logging.FileHandler(LOG_FILE),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Обработчик задач на публикацию в Instagram")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES,
+                        help="Количество процессов-обработчиков на этой машине")
+    parser.add_argument("--threads", type=int, default=MAX_WORKERS,
+                        help="Количество потоков выполнения задач в каждом процессе")
+    args = parser.parse_args()
+
+    # Инициализируем базу данных
+    logger.info("Инициализация базы данных...")
+    init_db()
+
+    if args.processes > 1:
+        start_worker_processes(args.processes, max_workers=args.threads)
+    else:
+        run_worker(max_workers=args.threads)
+
+if __name__ == '__main__':
+    main()